@@ -0,0 +1,150 @@
+"""
+This conftest.py contains the fixtures and options of the benchmark suite.
+
+Every benchmark records its wall time, peak RSS and rows/sec through the `benchmark_recorder`
+fixture. At the end of the session the results are appended to benchmarks/results/history.json
+and compared with benchmarks/results/baseline.json. When there is no baseline yet, the results
+of the session are stored as the baseline instead.
+"""
+
+import os
+import sys
+import shutil
+import logging
+import tempfile
+from typing import Any, Dict, Callable, Iterator
+from pathlib import Path
+
+import mlflow
+import pytest
+import harness
+from delta import configure_spark_with_delta_pip
+
+from pyspark.sql import SparkSession
+
+sys.path.append(os.path.join(os.path.dirname(__file__), os.pardir))
+
+# Data sizes (in rows) the benchmarks are parameterised with
+DATA_SIZES = [10**3, 10**4, 10**5, 10**6, 10**7]
+
+RESULTS: Dict[str, Dict[str, float]] = {}
+
+
+def pytest_addoption(parser: Any) -> None:
+    group = parser.getgroup("benchmarks")
+    group.addoption(
+        "--benchmark-max-rows",
+        type=int,
+        default=10**5,
+        help="skip benchmarks with a data size above this number of rows",
+    )
+    group.addoption(
+        "--benchmark-tolerance",
+        type=float,
+        default=0.2,
+        help="relative slowdown against the baseline that is flagged as a regression",
+    )
+    group.addoption(
+        "--benchmark-save-baseline", action="store_true", help="store the results as the new baseline"
+    )
+    group.addoption(
+        "--benchmark-fail-on-regression", action="store_true", help="fail the session on a regression"
+    )
+
+
+def pytest_collection_modifyitems(config: Any, items: Any) -> None:
+    max_rows = config.getoption("--benchmark-max-rows")
+    skip = pytest.mark.skip(reason=f"data size above --benchmark-max-rows={max_rows}")
+    for item in items:
+        callspec = getattr(item, "callspec", None)
+        if callspec is not None and callspec.params.get("rows", 0) > max_rows:
+            item.add_marker(skip)
+
+
+@pytest.fixture
+def benchmark_recorder(request: Any) -> Callable[..., Dict[str, float]]:
+    """
+    This fixture measures a benchmark and records the result under the name of the test.
+    :return: function taking the benchmark function, the number of rows and the number of rounds
+    """
+
+    def record(func: Callable[[], Any], rows: int, rounds: int = 1) -> Dict[str, float]:
+        result = harness.measure(func, rows=rows, rounds=rounds)
+        RESULTS[request.node.name] = result
+        logging.info(
+            f"{request.node.name}: {result['wall_seconds']:.4f}s, "
+            f"{result['rows_per_second']:.0f} rows/sec, peak RSS {result['peak_rss_bytes'] / 1024**2:.0f} MB"
+        )
+        return result
+
+    return record
+
+
+def pytest_sessionfinish(session: Any, exitstatus: int) -> None:
+    if not RESULTS:
+        return
+
+    config = session.config
+    harness.append_history(RESULTS)
+    if not harness.BASELINE_FILE.exists():
+        # the baseline depends on the machine, so the first run on a machine records it
+        reporter = config.pluginmanager.get_plugin("terminalreporter")
+        reporter.write_line(
+            f"No baseline at {harness.BASELINE_FILE}, nothing was compared. "
+            "The results of this run are stored as the baseline.",
+            yellow=True,
+            bold=True,
+        )
+        harness.save_baseline(RESULTS)
+        return
+
+    missing = sorted(set(RESULTS) - set(harness.read_json(harness.BASELINE_FILE, {})))
+    if missing and not config.getoption("--benchmark-save-baseline"):
+        logging.warning(f"Benchmarks without a baseline, not compared: {missing}")
+    regressions = harness.find_regressions(RESULTS, config.getoption("--benchmark-tolerance"))
+    for regression in regressions:
+        logging.warning(f"Performance regression: {regression}")
+    if config.getoption("--benchmark-save-baseline"):
+        harness.save_baseline(RESULTS)
+    if regressions and config.getoption("--benchmark-fail-on-regression"):
+        session.exitstatus = 1
+
+
+@pytest.fixture(scope="session")
+def spark() -> Iterator[SparkSession]:
+    """
+    This fixture provides a local SparkSession with Hive and Delta support for the benchmarks.
+    After the session, temporary warehouse directory is deleted.
+    :return: SparkSession
+    """
+    warehouse_dir = tempfile.TemporaryDirectory().name
+    _builder = (
+        SparkSession.builder.master("local[*]")
+        .config("spark.hive.metastore.warehouse.dir", Path(warehouse_dir).as_uri())
+        .config("spark.sql.extensions", "io.delta.sql.DeltaSparkSessionExtension")
+        .config(
+            "spark.sql.catalog.spark_catalog",
+            "org.apache.spark.sql.delta.catalog.DeltaCatalog",
+        )
+    )
+    spark: SparkSession = configure_spark_with_delta_pip(_builder).getOrCreate()
+    yield spark
+    spark.stop()
+    if Path(warehouse_dir).exists():
+        shutil.rmtree(warehouse_dir)
+
+
+@pytest.fixture(scope="session")
+def mlflow_local() -> Iterator[None]:
+    """
+    This fixture provides a local MLflow tracking store for the benchmarks of the ML task.
+    After the session, the temporary tracking store is deleted.
+    :return: None
+    """
+    tracking_uri = tempfile.TemporaryDirectory().name
+    mlflow.set_tracking_uri(Path(tracking_uri).as_uri())
+    yield None
+
+    mlflow.end_run()
+    if Path(tracking_uri).exists():
+        shutil.rmtree(tracking_uri)
@@ -0,0 +1,180 @@
+"""
+Measurement primitives of the benchmark suite: wall time, peak RSS and throughput of a
+single benchmark, plus the JSON history and baseline used to flag regressions.
+"""
+
+import sys
+import json
+import time
+import datetime
+import resource
+import threading
+import subprocess
+from typing import Any, Dict, List, Callable
+from pathlib import Path
+
+RESULTS_DIRECTORY = Path(__file__).parent / "results"
+HISTORY_FILE = RESULTS_DIRECTORY / "history.json"
+BASELINE_FILE = RESULTS_DIRECTORY / "baseline.json"
+
+# Increases of memory below this size are not reported as a regression
+MEMORY_NOISE_BYTES = 16 * 1024**2
+
+
+def current_rss() -> int:
+    """
+    Function to read the current resident set size of this process in bytes.
+    Falls back to the peak RSS on platforms without /proc.
+    """
+
+    try:
+        pages = int(Path("/proc/self/statm").read_text().split()[1])
+        return pages * resource.getpagesize()
+    except (OSError, IndexError, ValueError):
+        # ru_maxrss is reported in kilobytes on Linux and in bytes on macOS
+        maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return maxrss if sys.platform == "darwin" else maxrss * 1024
+
+
+class PeakMemorySampler:
+    """
+    Context manager that samples the RSS of this process in a background thread and keeps the peak.
+    Memory used by the Spark JVM is not part of the RSS of the Python process.
+
+    Parameters:
+
+    interval: seconds between two samples.
+
+    """
+
+    def __init__(self, interval: float = 0.01) -> None:
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+
+    def _sample(self) -> None:
+        while not self._stop.is_set():
+            self.peak = max(self.peak, current_rss())
+            self._stop.wait(self.interval)
+
+    def __enter__(self) -> "PeakMemorySampler":
+        self.peak = current_rss()
+        self._thread.start()
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, current_rss())
+
+
+def measure(func: Callable[[], Any], rows: int, rounds: int = 1) -> Dict[str, float]:
+    """
+    Function to measure a benchmark. The fastest of the rounds is reported.
+
+    Parameters:
+
+    func: function without arguments that runs the benchmark once.
+    rows: number of rows processed by a single run, used for the throughput.
+    rounds: number of times the benchmark is run.
+    """
+
+    timings = []
+    start_rss = current_rss()
+    with PeakMemorySampler() as sampler:
+        for _ in range(rounds):
+            start = time.perf_counter()
+            func()
+            timings.append(time.perf_counter() - start)
+
+    wall_seconds = min(timings)
+    return {
+        "rows": rows,
+        "wall_seconds": wall_seconds,
+        "peak_rss_bytes": sampler.peak,
+        "rss_increase_bytes": max(0, sampler.peak - start_rss),
+        "rows_per_second": rows / wall_seconds if wall_seconds > 0 else float("inf"),
+    }
+
+
+def git_commit() -> str:
+    """
+    Function to determine the commit the benchmarks ran on.
+    """
+
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def read_json(path: Path, default: Any) -> Any:
+    if not path.exists():
+        return default
+    return json.loads(path.read_text())
+
+
+def append_history(results: Dict[str, Dict[str, float]]) -> None:
+    """
+    Function to append the results of a benchmark session to the JSON history.
+
+    Parameters:
+
+    results: measurements per benchmark.
+    """
+
+    history: List[Dict[str, Any]] = read_json(HISTORY_FILE, [])
+    history.append(
+        {
+            "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+            "commit": git_commit(),
+            "results": results,
+        }
+    )
+    RESULTS_DIRECTORY.mkdir(parents=True, exist_ok=True)
+    HISTORY_FILE.write_text(json.dumps(history, indent=2))
+
+
+def save_baseline(results: Dict[str, Dict[str, float]]) -> None:
+    """
+    Function to store the results of a benchmark session as the baseline, keeping the
+    baseline of benchmarks that did not run in this session.
+
+    Parameters:
+
+    results: measurements per benchmark.
+    """
+
+    baseline = read_json(BASELINE_FILE, {})
+    baseline.update(results)
+    RESULTS_DIRECTORY.mkdir(parents=True, exist_ok=True)
+    BASELINE_FILE.write_text(json.dumps(baseline, indent=2, sort_keys=True))
+
+
+def find_regressions(results: Dict[str, Dict[str, float]], tolerance: float) -> List[str]:
+    """
+    Function to compare the results with the stored baseline. A benchmark regressed when its
+    wall time or its increase of the RSS exceeds the baseline by more than the tolerance.
+
+    Parameters:
+
+    results: measurements per benchmark.
+    tolerance: allowed relative increase, e.g. 0.2 for 20%.
+    """
+
+    baseline = read_json(BASELINE_FILE, {})
+    regressions = []
+    for name, result in sorted(results.items()):
+        if name not in baseline:
+            continue
+        for metric, noise in [("wall_seconds", 0.0), ("rss_increase_bytes", MEMORY_NOISE_BYTES)]:
+            reference = baseline[name].get(metric, 0)
+            if result[metric] > reference * (1 + tolerance) + noise and reference > 0:
+                regressions.append(
+                    f"{name}: {metric} {result[metric]:.4g} vs baseline {reference:.4g} "
+                    f"(+{result[metric] / reference - 1:.0%})"
+                )
+    return regressions
@@ -0,0 +1,148 @@
+"""
+Startup benchmark for the etl and model console entry points.
+
+Every run starts a fresh interpreter, imports the entry point module and constructs its
+task the same way the entrypoint() function does, with the sample configuration of the task
+as --conf-file. As the task creates its configuration and logger on first access, the run
+also times the first access of task.conf and of task.logger. Reading the configuration does
+not start the SparkSession, its start is part of the first access of task.logger.
+Reports the median import, init, conf and logger time next to the baseline in
+benchmarks/results/baseline.json. When an entry point has no baseline yet, the results of the
+run are stored as its baseline, --save-baseline replaces the stored baseline.
+
+Usage: python benchmarks/startup.py [--runs 5] [--output startup.json] [--save-baseline]
+"""
+
+import sys
+import json
+import statistics
+import subprocess
+from typing import Any, Dict
+from pathlib import Path
+from argparse import ArgumentParser
+
+import harness
+
+CONF_DIRECTORY = Path(__file__).parents[1] / "conf" / "test"
+
+ENTRY_POINTS = {
+    "etl": ("examplerepo.tasks.sample_etl_task", "SampleSimulatedDataTask", "sample_etl_config.yml"),
+    "model": ("examplerepo.tasks.sample_ml_task", "SampleModelTask", "sample_ml_config.yml"),
+}
+
+PHASES = ["import_seconds", "init_seconds", "conf_seconds", "logger_seconds"]
+
+MEASUREMENT = """
+import sys
+import json
+import time
+
+sys.argv = sys.argv[:1] + ["--conf-file", {conf_file!r}]
+start = time.perf_counter()
+import {module} as entry_point
+imported = time.perf_counter()
+task = entry_point.{task}()
+initialised = time.perf_counter()
+task.conf
+configured = time.perf_counter()
+task.logger
+logged = time.perf_counter()
+print(
+    json.dumps(
+        {{
+            "import_seconds": imported - start,
+            "init_seconds": initialised - imported,
+            "conf_seconds": configured - initialised,
+            "logger_seconds": logged - configured,
+        }}
+    )
+)
+"""
+
+
+def measure_startup(module: str, task: str, conf_file: str) -> Dict[str, float]:
+    """
+    Function to measure the import, init, conf and logger time of an entry point in a fresh interpreter.
+
+    Parameters:
+
+    module: module containing the entry point.
+    task: name of the task class constructed by the entry point.
+    conf_file: configuration file passed to the task as --conf-file.
+    """
+
+    output = subprocess.run(
+        [sys.executable, "-c", MEASUREMENT.format(module=module, task=task, conf_file=conf_file)],
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def format_phase(phase: str, seconds: float, baseline: Dict[str, float]) -> str:
+    """
+    Function to format the time of a phase, next to its baseline when there is one.
+
+    Parameters:
+
+    phase: name of the phase, e.g. conf_seconds.
+    seconds: measured time of the phase.
+    baseline: baseline times of the entry point by phase.
+    """
+
+    text = f"{phase[: -len('_seconds')]}: {seconds:.3f}s"
+    if phase in baseline:
+        text += f" (baseline {baseline[phase]:.3f}s)"
+    return text
+
+
+def run(runs: int = 5, save_baseline: bool = False) -> Dict[str, Any]:
+    """
+    Function to measure the startup of all entry points, summarise the runs by their median and
+    compare them with the baseline.
+
+    Parameters:
+
+    runs: number of fresh interpreters started per entry point.
+    save_baseline: store the results as the new baseline.
+    """
+
+    baselines = harness.read_json(harness.BASELINE_FILE, {})
+    results: Dict[str, Any] = {}
+    for name, (module, task, conf_name) in ENTRY_POINTS.items():
+        conf_file = str(CONF_DIRECTORY / conf_name)
+        measurements = [measure_startup(module, task, conf_file) for _ in range(runs)]
+        results[name] = {
+            key: statistics.median(measurement[key] for measurement in measurements) for key in PHASES
+        }
+        baseline = baselines.get(f"startup_{name}", {})
+        print(
+            f"{name:<6} "
+            + " ".join(format_phase(phase, results[name][phase], baseline) for phase in PHASES)
+            + f" (median of {runs} runs)"
+        )
+
+    # the baseline depends on the machine, so the first run on a machine records it
+    missing = [name for name in results if f"startup_{name}" not in baselines]
+    if missing and not save_baseline:
+        print(f"No baseline for {missing}, the results of this run are stored as the baseline.")
+    harness.append_history({f"startup_{name}": result for name, result in results.items()})
+    baseline_results = {
+        f"startup_{name}": result for name, result in results.items() if save_baseline or name in missing
+    }
+    if baseline_results:
+        harness.save_baseline(baseline_results)
+    return results
+
+
+if __name__ == "__main__":
+    p = ArgumentParser()
+    p.add_argument("--runs", type=int, default=5)
+    p.add_argument("--output", required=False, type=str)
+    p.add_argument("--save-baseline", action="store_true", help="store the results as the new baseline")
+    namespace = p.parse_args()
+    startup_results = run(namespace.runs, namespace.save_baseline)
+    if namespace.output:
+        with open(namespace.output, "w") as output_file:
+            json.dump(startup_results, output_file, indent=2)
@@ -0,0 +1,55 @@
+"""
+Benchmarks of the arma process: statsmodels' arma_generate_sample against the lfilter batch
+"""
+
+from typing import Dict, Callable
+
+import numpy as np
+import pytest
+from conftest import DATA_SIZES
+from statsmodels.tsa.arima_process import arma_generate_sample
+
+from examplerepo.testdata.create.simulation import (
+    simulate_arma_batch,
+    _broadcast_scalar_parameter,
+    _broadcast_vector_parameter,
+)
+
+ARPARAMS = np.array([0.75, -0.25])
+MAPARAMS = np.array([0.65, 0.35])
+SCALE = 0.4
+TIMERANGE = 208
+
+
+def simulate_statsmodels(noise: np.ndarray) -> np.ndarray:
+    ar = np.r_[1, -ARPARAMS]
+    ma = np.r_[1, MAPARAMS]
+    return np.array(
+        [
+            arma_generate_sample(ar, ma, TIMERANGE, scale=SCALE, distrvs=lambda size: series).round(4)
+            for series in noise
+        ]
+    )
+
+
+def simulate_lfilter(noise: np.ndarray) -> np.ndarray:
+    n_series = noise.shape[0]
+    return simulate_arma_batch(
+        timerange=TIMERANGE,
+        arparams=_broadcast_vector_parameter(ARPARAMS, n_series),
+        maparams=_broadcast_vector_parameter(MAPARAMS, n_series),
+        scale=_broadcast_scalar_parameter(SCALE, n_series),
+        noise=noise,
+    )
+
+
+@pytest.mark.parametrize("rows", DATA_SIZES)
+@pytest.mark.parametrize("backend", ["statsmodels", "lfilter"])
+def test_arma(benchmark_recorder: Callable[..., Dict[str, float]], backend: str, rows: int) -> None:
+    n_series = max(1, rows // TIMERANGE)
+    noise = np.random.default_rng(12345).standard_normal((n_series, TIMERANGE))
+    simulate = simulate_statsmodels if backend == "statsmodels" else simulate_lfilter
+
+    result = benchmark_recorder(lambda: simulate(noise), rows=n_series * TIMERANGE, rounds=3)
+    assert result["rows_per_second"] > 0
+    assert np.array_equal(simulate_statsmodels(noise[:2]), simulate_lfilter(noise[:2]))
@@ -0,0 +1,68 @@
+"""
+Benchmarks of the estimator backends of the ML task: fit and predict time and r2 on simulated data
+"""
+
+from typing import Dict, Callable
+
+import numpy as np
+import pytest
+from conftest import DATA_SIZES
+from sklearn.metrics import r2_score
+from sklearn.ensemble import RandomForestRegressor
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import StandardScaler
+from sklearn.model_selection import train_test_split
+
+from examplerepo.tasks.sample_ml_task import ESTIMATORS, SampleModelTask, get_features
+from examplerepo.tasks.sample_etl_task import SampleSimulatedDataTask
+from examplerepo.testdata.create.simulation import simulate_timeseries_batch
+
+TIMERANGE = 208
+FEATURES = ["time", "sales_arma", "promotion_timing"]
+
+# Training a random forest on the driver does not scale to the largest data sizes
+ML_MAX_ROWS = 10**6
+
+
+def create_reference_pipeline(n_jobs: int = -1) -> Pipeline:
+    """
+    Function to create the pipeline as it was before the estimator backends, used as the
+    reference of the benchmark.
+    """
+    return Pipeline([("scaler", StandardScaler()), ("random_forest", RandomForestRegressor(n_jobs=n_jobs))])
+
+
+def create_pipeline(backend: str) -> Pipeline:
+    if backend == "reference":
+        return create_reference_pipeline()
+    return Pipeline([(backend, ESTIMATORS[backend](n_jobs=-1))])
+
+
+def create_dataset(rows: int) -> list:
+    settings = {
+        key: value for key, value in SampleSimulatedDataTask.DEFAULT_SIMULATION.items() if key != "timerange"
+    }
+    settings["arparams"] = np.array(settings["arparams"])
+    settings["maparams"] = np.array(settings["maparams"])
+    data = simulate_timeseries_batch(n_series=max(1, rows // TIMERANGE), timerange=TIMERANGE, **settings)
+    X = get_features(data[FEATURES], [])
+    return train_test_split(X, data[SampleModelTask.TARGET_COLUMN], random_state=12345)
+
+
+@pytest.mark.parametrize("rows", [rows for rows in DATA_SIZES if rows <= ML_MAX_ROWS])
+@pytest.mark.parametrize("backend", ["reference", "random_forest", "lightgbm"])
+@pytest.mark.parametrize("phase", ["fit", "predict"])
+def test_estimator(
+    benchmark_recorder: Callable[..., Dict[str, float]], phase: str, backend: str, rows: int
+) -> None:
+    X_train, X_test, y_train, y_test = create_dataset(rows)
+    pipeline = create_pipeline(backend)
+    if phase == "fit":
+        result = benchmark_recorder(lambda: pipeline.fit(X_train, y_train), rows=len(X_train.index))
+    else:
+        pipeline.fit(X_train, y_train)
+        result = benchmark_recorder(lambda: pipeline.predict(X_test), rows=len(X_test.index), rounds=3)
+
+    # the r2 is recorded with the timings to compare the accuracy of the backends
+    result["r2"] = r2_score(y_test, pipeline.predict(X_test))
+    assert result["r2"] > 0
@@ -0,0 +1,83 @@
+"""
+Benchmarks of the reshaping of downloaded Google Trends data
+"""
+
+from typing import Dict, List, Callable
+
+import numpy as np
+import pandas as pd
+import pytest
+from conftest import DATA_SIZES
+
+from examplerepo.testdata.create.googletrends import reshape_data, reshape_data_columnar
+
+N_KEYWORDS = 10
+
+
+def create_wide_data(rows: int) -> pd.DataFrame:
+    """
+    Function to create a dataframe in the format returned by TrendReq.interest_over_time,
+    with rows the number of rows after reshaping into the long format.
+    """
+    n_dates = max(1, rows // N_KEYWORDS)
+    keywords = [f"keyword_{i}" for i in range(N_KEYWORDS)]
+    dates = pd.date_range("1900-01-07", periods=n_dates, freq="D", name="date")
+    values = np.random.default_rng(12345).integers(0, 100, size=(n_dates, N_KEYWORDS))
+    googletrends_data = pd.DataFrame(values, index=dates, columns=keywords)
+    googletrends_data["isPartial"] = False
+    return googletrends_data
+
+
+def reshape_data_melt(googletrendsresults_load: pd.DataFrame, keywords: List) -> pd.DataFrame:
+    """
+    Function with the reshape into the long format as it was done before the columnar
+    reshape, used as the reference of the benchmark.
+    """
+    googletrendsresults_load = googletrendsresults_load.reset_index()
+    googletrendsresults_load["date"] = googletrendsresults_load["date"].astype(str).str[:10]
+    return pd.melt(
+        googletrendsresults_load,
+        id_vars=["date", "isPartial"],
+        value_vars=keywords,
+        var_name="keyword",
+        value_name="interest",
+    )
+
+
+RESHAPE_FUNCTIONS: Dict[str, Callable[[pd.DataFrame, List], pd.DataFrame]] = {
+    "melt": reshape_data_melt,
+    "columnar": lambda data, keywords: reshape_data(data, longformat=True, keywords=keywords),
+    "columnar_categorical": lambda data, keywords: reshape_data_columnar(
+        data, keywords=keywords, date_format="datetime", categorical_keyword=True
+    ),
+}
+
+
+@pytest.mark.parametrize("rows", DATA_SIZES)
+@pytest.mark.parametrize("implementation", list(RESHAPE_FUNCTIONS))
+def test_reshape_data(
+    benchmark_recorder: Callable[..., Dict[str, float]], rows: int, implementation: str
+) -> None:
+    googletrends_data = create_wide_data(rows)
+    keywords = [column for column in googletrends_data.columns if column != "isPartial"]
+    reshape = RESHAPE_FUNCTIONS[implementation]
+
+    result = benchmark_recorder(
+        lambda: reshape(googletrends_data, keywords),
+        rows=len(googletrends_data.index) * N_KEYWORDS,
+        rounds=3,
+    )
+    assert result["rows_per_second"] > 0
+
+
+def test_reshape_data_wide(benchmark_recorder: Callable[..., Dict[str, float]]) -> None:
+    googletrends_data = create_wide_data(10**5)
+    keywords = [column for column in googletrends_data.columns if column != "isPartial"]
+
+    # reshape_data resets the index in place in the wide format, therefore every round gets its own copy
+    result = benchmark_recorder(
+        lambda: reshape_data(googletrends_data.copy(), longformat=False, keywords=keywords),
+        rows=len(googletrends_data.index) * N_KEYWORDS,
+        rounds=3,
+    )
+    assert result["rows_per_second"] > 0
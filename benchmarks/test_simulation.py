@@ -0,0 +1,41 @@
+"""
+Benchmarks of the simulation of sales timeseries
+"""
+
+from typing import Dict, Callable
+
+import numpy as np
+import pytest
+from conftest import DATA_SIZES
+
+from examplerepo.testdata.create.simulation import simulate_timeseries, simulate_timeseries_batch
+
+SIMULATION = {
+    "fullyear": 52,
+    "frequencies": [1, 2],
+    "amplitudes": [4, 4],
+    "arparams": np.array([0.75, -0.25]),
+    "maparams": np.array([0.65, 0.35]),
+    "scale": 0.4,
+    "promotion": True,
+    "promotion_uplift": 0.5,
+    "promotion_frequency": 5,
+    "seed": 12345,
+}
+TIMERANGE = 208
+
+
+@pytest.mark.parametrize("rows", DATA_SIZES)
+def test_simulate_timeseries(benchmark_recorder: Callable[..., Dict[str, float]], rows: int) -> None:
+    result = benchmark_recorder(lambda: simulate_timeseries(timerange=rows, **SIMULATION), rows=rows)
+    assert result["rows_per_second"] > 0
+
+
+@pytest.mark.parametrize("rows", DATA_SIZES)
+def test_simulate_timeseries_batch(benchmark_recorder: Callable[..., Dict[str, float]], rows: int) -> None:
+    n_series = max(1, rows // TIMERANGE)
+    result = benchmark_recorder(
+        lambda: simulate_timeseries_batch(n_series=n_series, timerange=TIMERANGE, **SIMULATION),
+        rows=n_series * TIMERANGE,
+    )
+    assert result["rows_per_second"] > 0
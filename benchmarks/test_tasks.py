@@ -0,0 +1,57 @@
+"""
+Benchmarks of the ETL and ML tasks on a local SparkSession
+"""
+
+from typing import Dict, Callable
+
+import pytest
+from conftest import DATA_SIZES
+
+from pyspark.sql import SparkSession
+
+from examplerepo.tasks.sample_ml_task import SampleModelTask
+from examplerepo.tasks.sample_etl_task import SampleSimulatedDataTask
+
+TIMERANGE = 208
+
+# Training a random forest on the driver does not scale to the largest data sizes
+ML_MAX_ROWS = 10**6
+
+
+def create_etl_config(rows: int) -> dict:
+    n_series = max(1, rows // TIMERANGE)
+    return {
+        "output": {"database": "default", "table": f"benchmark_timeseries_{rows}"},
+        "simulation": {
+            "mode": "distributed",
+            "n_series": n_series,
+            "series_per_partition": max(1, n_series // 8),
+            "timerange": TIMERANGE,
+        },
+    }
+
+
+@pytest.mark.parametrize("rows", DATA_SIZES)
+def test_etl_task(
+    spark: SparkSession, benchmark_recorder: Callable[..., Dict[str, float]], rows: int
+) -> None:
+    etl_config = create_etl_config(rows)
+    n_rows = etl_config["simulation"]["n_series"] * TIMERANGE
+    result = benchmark_recorder(lambda: SampleSimulatedDataTask(spark, etl_config).launch(), rows=n_rows)
+    assert result["rows_per_second"] > 0
+
+
+@pytest.mark.parametrize("rows", [rows for rows in DATA_SIZES if rows <= ML_MAX_ROWS])
+def test_ml_task(
+    spark: SparkSession, mlflow_local: None, benchmark_recorder: Callable[..., Dict[str, float]], rows: int
+) -> None:
+    etl_config = create_etl_config(rows)
+    SampleSimulatedDataTask(spark, etl_config).launch()
+    ml_config = {
+        "input": etl_config["output"],
+        "experiment": "/Shared/forecastingtest/benchmark_experiment",
+        "training": {"n_jobs": -1},
+    }
+    n_rows = etl_config["simulation"]["n_series"] * TIMERANGE
+    result = benchmark_recorder(lambda: SampleModelTask(spark, ml_config).launch(), rows=n_rows)
+    assert result["rows_per_second"] > 0
@@ -1,13 +1,57 @@
 import sys
+import json
+import hashlib
 import pathlib
+import datetime
+import importlib.metadata
 from abc import ABC, abstractmethod
-from typing import Any, Dict
+from typing import Any, Dict, List, Callable, Iterable, Iterator
 from logging import Logger
-from argparse import ArgumentParser
+from argparse import Namespace, ArgumentParser
+from functools import wraps, cached_property
+from contextlib import contextmanager
 
-import yaml
+import numpy as np
+import pandas as pd
+import pyarrow as pa
 
-from pyspark.sql import SparkSession
+from pyspark.sql import DataFrame, SparkSession
+from pyspark.sql.types import (
+    ByteType,
+    DataType,
+    LongType,
+    FloatType,
+    ShortType,
+    DoubleType,
+    StringType,
+    StructType,
+    BooleanType,
+    IntegerType,
+    StructField,
+    TimestampType,
+)
+
+import examplerepo
+from examplerepo.config import read_config, validate_config, apply_env_overrides
+from examplerepo.helperfunctions.profiling import Profiler
+from examplerepo.helperfunctions.instrumentation import Span, write_trace
+
+# Mapping of numpy dtypes onto Spark types, used to keep e.g. float32 columns float32 in Spark
+SPARK_TYPES: Dict[Any, DataType] = {
+    np.dtype("float32"): FloatType(),
+    np.dtype("float64"): DoubleType(),
+    np.dtype("int8"): ByteType(),
+    np.dtype("int16"): ShortType(),
+    np.dtype("int32"): IntegerType(),
+    np.dtype("int64"): LongType(),
+    np.dtype("bool"): BooleanType(),
+    np.dtype("datetime64[ns]"): TimestampType(),
+}
+
+# Table property that holds the fingerprint of the launch that wrote a table
+FINGERPRINT_PROPERTY = "examplerepo.fingerprint"
+# Sections of the configuration that do not change the results of a task
+FINGERPRINT_EXCLUDED_KEYS = ["instrumentation", "profile", "memoize"]
 
 
 def get_dbutils(
@@ -25,6 +69,127 @@ def get_dbutils(
         return None
 
 
+def get_spark_schema(data: pd.DataFrame) -> StructType:
+    """
+    Function to derive an explicit Spark schema from the dtypes of a pandas dataframe.
+    Columns with a dtype that has no direct Spark counterpart are stored as strings.
+
+    Parameters:
+
+    data: pandas dataframe for which the schema needs to be derived.
+    """
+
+    return StructType(
+        [
+            StructField(str(column), SPARK_TYPES.get(dtype, StringType()), True)
+            for column, dtype in data.dtypes.items()
+        ]
+    )
+
+
+def traced(name: Any = None) -> Callable:
+    """
+    Decorator that runs a method of a task inside a span. When the method returns a pandas
+    dataframe, its number of rows is recorded on the span.
+
+    Parameters:
+
+    name: name of the span, the name of the method when empty.
+    """
+
+    def decorator(method: Callable) -> Callable:
+        @wraps(method)
+        def wrapper(self: "Task", *args: Any, **kwargs: Any) -> Any:
+            with self.span(name or method.__name__) as span:
+                result = method(self, *args, **kwargs)
+                if isinstance(result, pd.DataFrame):
+                    span.rows = len(result.index)
+                return result
+
+        return wrapper
+
+    return decorator
+
+
+def serialize_batches(batches: Iterable[pa.RecordBatch]) -> Iterable[pa.RecordBatch]:
+    """
+    Function that runs on the executors and serializes every Arrow record batch of a partition
+    into a single binary value, so the driver can fetch the batches partition by partition.
+    Used with mapInArrow.
+
+    Parameters:
+
+    batches: Arrow record batches of a partition.
+    """
+
+    for batch in batches:
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_stream(sink, batch.schema) as writer:
+            writer.write_batch(batch)
+        yield pa.record_batch([pa.array([sink.getvalue().to_pybytes()], type=pa.binary())], names=["batch"])
+
+
+def package_version() -> str:
+    """
+    Function to determine the version of the installed examplerepo package.
+    """
+
+    try:
+        return importlib.metadata.version("examplerepo")
+    except importlib.metadata.PackageNotFoundError:
+        return examplerepo.__version__
+
+
+def memoized(method: Callable) -> Callable:
+    """
+    Decorator that skips the launch of a task when all its output tables were written by a launch
+    with the same fingerprint, i.e. the same configuration, package version and versions of the input
+    tables. Enabled with memoize.enabled, and overridden with memoize.force or the --force job option.
+    The fingerprint is only stored on the output tables once the launch succeeded.
+    """
+
+    @wraps(method)
+    def wrapper(self: "Task", *args: Any, **kwargs: Any) -> Any:
+        memoize_conf = self._get_memoize_conf()
+        if not memoize_conf.get("enabled", False):
+            return method(self, *args, **kwargs)
+
+        fingerprint = self._get_fingerprint()
+        output_tables = self._get_output_tables()
+        if fingerprint is None or not output_tables:
+            self.logger.info("The results of the task cannot be memoized, launching")
+            return method(self, *args, **kwargs)
+
+        stored_fingerprints = [self._get_stored_fingerprint(table_name) for table_name in output_tables]
+        if memoize_conf.get("force", False):
+            self.logger.info("Launch is forced, ignoring the fingerprints of the output tables")
+        elif all(stored == fingerprint for stored in stored_fingerprints):
+            self.logger.info(
+                f"Output tables {output_tables} are up to date (fingerprint {fingerprint}), skipping"
+            )
+            for table_name in output_tables:
+                self._publish(table_name, self.spark.table(table_name))
+            return None
+
+        # the fingerprint is removed before the launch writes, so a launch that fails after
+        # writing part of the outputs does not leave them marked as up to date
+        for table_name, stored in zip(output_tables, stored_fingerprints):
+            if stored is not None:
+                self.spark.sql(
+                    f"ALTER TABLE {table_name} UNSET TBLPROPERTIES IF EXISTS ('{FINGERPRINT_PROPERTY}')"
+                )
+
+        result = method(self, *args, **kwargs)
+        for table_name in output_tables:
+            if self.spark.catalog.tableExists(table_name):
+                self.spark.sql(
+                    f"ALTER TABLE {table_name} SET TBLPROPERTIES ('{FINGERPRINT_PROPERTY}' = '{fingerprint}')"
+                )
+        return result
+
+    return wrapper
+
+
 class Task(ABC):
     """
     This is an abstract class that provides handy
@@ -35,17 +200,85 @@ class Task(ABC):
     * self.dbutils provides access to the DBUtils
     * self.logger provides access to the Spark-compatible logger
     * self.conf provides access to the parsed configuration of the job
+    * self._to_spark and self._to_pandas transfer data between pandas and Spark using Arrow
+    * self._to_arrow_batches streams a Spark dataframe to the driver partition by partition
+    * self.span and the traced decorator time the steps of the task
+    * self.run launches the task, profiled when --profile or profile.enabled is set
+    * self.inputs and self.outputs hold the results shared between the tasks of a pipeline
+    * the memoized decorator skips a launch when the output tables are up to date
+    All of these objects are created on first access, so constructing a task is cheap.
     """
 
-    def __init__(self, spark: Any = None, init_conf: Any = None) -> None:
-        self.spark = self._prepare_spark(spark)
-        self.logger = self._prepare_logger()
-        self.dbutils = self.get_dbutils()
-        if init_conf:
-            self.conf = init_conf
-        else:
-            self.conf = self._provide_config()
-        self._log_conf()
+    ARROW_BATCH_SIZE: int = 10000
+    # Schema the configuration is validated against, see examplerepo.config; not validated when empty
+    CONFIG_SCHEMA: Any = None
+
+    def __init__(self, spark: Any = None, init_conf: Any = None, inputs: Any = None) -> None:
+        # results of upstream tasks by table name, and the results shared by this task when it runs
+        # in a pipeline (None when it runs on its own), see examplerepo.tasks.pipeline_task
+        self.inputs: Dict[str, Any] = inputs or {}
+        self.outputs: Any = None
+        self.bytes_transferred = 0
+        self.spans: List[Span] = []
+        self._active_spans: List[Span] = []
+        # messages logged before the logger exists, see _log_info
+        self._pending_messages: List[str] = []
+        self._spark = spark
+        self._init_conf = init_conf
+
+    @cached_property
+    def spark(self) -> SparkSession:
+        return self._prepare_spark(self._spark)
+
+    @cached_property
+    def logger(self) -> Logger:
+        logger = self._prepare_logger()
+        for message in self._pending_messages:
+            logger.info(message)
+        self._pending_messages = []
+        return logger
+
+    @cached_property
+    def dbutils(self) -> Any:
+        return self.get_dbutils()
+
+    @cached_property
+    def conf(self) -> Dict[str, Any]:
+        # the configuration is read, validated and logged without creating the logger, and with it
+        # the SparkSession, so an invalid configuration fails without starting Spark
+        parent = self._active_spans[-1].name if self._active_spans else None
+        span = Span("read_config", parent=parent, depth=len(self._active_spans))
+        try:
+            if self._init_conf:
+                conf = self._init_conf
+            else:
+                conf = self._provide_config()
+            conf = apply_env_overrides(conf, schema=self.CONFIG_SCHEMA)
+            self.validate_conf(conf)
+        finally:
+            span.finish()
+            self.spans.append(span)
+        self._emit_span(span)
+        if not self._init_conf:
+            conf_file = self._get_conf_file()
+            if conf_file:
+                self._log_info(f"Conf file was provided, read configuration from {conf_file}")
+            else:
+                self._log_info(
+                    "No conf file was provided, setting configuration to empty dict."
+                    "Please override configuration in subclass init method"
+                )
+        self._log_conf(conf)
+        return conf
+
+    @classmethod
+    def validate_conf(cls, conf: Dict[str, Any]) -> None:
+        """
+        Validates a configuration against the schema of the task, raising a ConfigError that lists
+        all problems. Called when the configuration is read, i.e. before the task starts any Spark job.
+        """
+        if cls.CONFIG_SCHEMA is not None:
+            validate_config(conf, cls.CONFIG_SCHEMA)
 
     @staticmethod
     def _prepare_spark(spark: Any) -> SparkSession:
@@ -65,39 +298,361 @@ class Task(ABC):
         return utils
 
     def _provide_config(self) -> Any:
-        self.logger.info("Reading configuration from --conf-file job option")
+        # reads the configuration from the --conf-file job option, logged once it is validated
         conf_file = self._get_conf_file()
         if not conf_file:
-            self.logger.info(
-                "No conf file was provided, setting configuration to empty dict."
-                "Please override configuration in subclass init method"
-            )
             return {}
         else:
-            self.logger.info(f"Conf file was provided, reading configuration from {conf_file}")
             return self._read_config(conf_file)
 
     @staticmethod
-    def _get_conf_file() -> Any:
+    def _parse_arguments() -> Namespace:
         p = ArgumentParser()
         p.add_argument("--conf-file", required=False, type=str)
+        p.add_argument("--profile", action="store_true", help="profile the run with cProfile and tracemalloc")
+        p.add_argument("--profile-dir", required=False, type=str, help="directory of the profile reports")
+        p.add_argument(
+            "--force", action="store_true", help="launch even when the output tables are up to date"
+        )
         namespace = p.parse_known_args(sys.argv[1:])[0]
-        return namespace.conf_file
+        return namespace
+
+    @staticmethod
+    def _get_conf_file() -> Any:
+        return Task._parse_arguments().conf_file
 
     @staticmethod
     def _read_config(conf_file: Any) -> Dict[str, Any]:
-        config = yaml.safe_load(pathlib.Path(conf_file).read_text())
+        config = read_config(conf_file)
         return config
 
     def _prepare_logger(self) -> Logger:
         log4j_logger = self.spark._jvm.org.apache.log4j  # noqa
         return log4j_logger.LogManager.getLogger(self.__class__.__name__)
 
-    def _log_conf(self) -> None:
+    def _log_info(self, message: str) -> None:
+        # logs through the logger once the SparkSession exists, until then the message is kept
+        # and logged when the logger is created, so logging does not start Spark
+        if "spark" in self.__dict__ or self._spark:
+            self.logger.info(message)
+        else:
+            self._pending_messages.append(message)
+
+    def _get_instrumentation_conf(self) -> Dict[str, Any]:
+        # the configuration itself is read inside a span, fall back to the init conf until it is available
+        conf = self.__dict__.get("conf") or self._init_conf or {}
+        return conf.get("instrumentation", {})
+
+    @contextmanager
+    def span(self, name: str) -> Iterator[Span]:
+        """
+        Context manager that times a step of the task. The span captures the duration, the peak RSS
+        of the process and how far the step raised it, the bytes transferred between pandas and Spark,
+        and the number of rows when it is set on the span. Finished spans are logged, logged as MLflow
+        metrics when a run is active and written to the trace file (instrumentation.trace_file) after
+        the outermost span.
+        """
+        parent = self._active_spans[-1].name if self._active_spans else None
+        span = Span(name, parent=parent, depth=len(self._active_spans))
+        bytes_transferred = self.bytes_transferred
+        self._active_spans.append(span)
+        try:
+            yield span
+        finally:
+            self._active_spans.pop()
+            span.finish()
+            if span.bytes is None and self.bytes_transferred > bytes_transferred:
+                span.bytes = self.bytes_transferred - bytes_transferred
+            self.spans.append(span)
+            self._emit_span(span)
+
+    def _emit_span(self, span: Span) -> None:
+        instrumentation_conf = self._get_instrumentation_conf()
+        if not instrumentation_conf.get("enabled", True):
+            return
+
+        metrics = span.metrics()
+        self._log_info(
+            f"Span {span.name} took {span.duration:.3f}s "
+            + ", ".join(f"{key}: {value:.0f}" for key, value in metrics.items() if key != "duration_seconds")
+        )
+
+        # mlflow is only used when the task imported it, e.g. the ML task
+        mlflow = sys.modules.get("mlflow")
+        if instrumentation_conf.get("mlflow", True) and mlflow is not None and mlflow.active_run():
+            step = sum(1 for other in self.spans if other.name == span.name) - 1
+            mlflow.log_metrics(
+                {f"span.{span.name}.{key}": value for key, value in metrics.items()}, step=step
+            )
+
+        if "trace_file" in instrumentation_conf and not self._active_spans:
+            write_trace(self.spans, instrumentation_conf["trace_file"])
+
+    def _enable_arrow(self) -> None:
+        batch_size = self.conf.get("io", {}).get("arrow_batch_size", self.ARROW_BATCH_SIZE)
+        self.spark.conf.set("spark.sql.execution.arrow.pyspark.enabled", "true")
+        self.spark.conf.set("spark.sql.execution.arrow.pyspark.selfDestruct.enabled", "true")
+        self.spark.conf.set("spark.sql.execution.arrow.maxRecordsPerBatch", str(batch_size))
+
+    def _to_spark(self, data: pd.DataFrame, schema: Any = None) -> DataFrame:
+        """
+        Converts a pandas dataframe into a Spark dataframe using chunked Arrow record batches.
+        When no schema is given, it is derived from the pandas dtypes.
+        """
+        self._enable_arrow()
+        if schema is None:
+            schema = get_spark_schema(data)
+        transferred = int(data.memory_usage(index=False, deep=True).sum())
+        with self.span("to_spark") as span:
+            df = self.spark.createDataFrame(data, schema=schema)
+            self.bytes_transferred += transferred
+            span.rows = len(data.index)
+        self.logger.info(f"Transferred {len(data.index)} rows ({transferred} bytes) from pandas to Spark")
+        return df
+
+    def _to_pandas(self, df: DataFrame) -> pd.DataFrame:
+        """
+        Collects a Spark dataframe into a pandas dataframe using chunked Arrow record batches.
+        """
+        self._enable_arrow()
+        with self.span("to_pandas") as span:
+            data: pd.DataFrame = df.toPandas()
+            transferred = int(data.memory_usage(index=False, deep=True).sum())
+            self.bytes_transferred += transferred
+            span.rows = len(data.index)
+        self.logger.info(f"Transferred {len(data.index)} rows ({transferred} bytes) from Spark to pandas")
+        return data
+
+    def _to_arrow_batches(self, df: DataFrame) -> Iterator[pa.RecordBatch]:
+        """
+        Streams a Spark dataframe to the driver as Arrow record batches. The driver fetches a single
+        partition at a time, so its memory use depends on the size of the partitions, not of the dataframe.
+        """
+        self._enable_arrow()
+        serialized = df.mapInArrow(serialize_batches, schema="batch binary")
+        for row in serialized.toLocalIterator():
+            batch = pa.ipc.open_stream(row["batch"]).read_next_batch()
+            self.bytes_transferred += batch.nbytes
+            yield batch
+
+    def _read_table(self, table_name: str) -> DataFrame:
+        """
+        Reads a table, or the result an upstream task of the pipeline shared under the name of the table.
+        Results shared as Arrow tables are transferred to Spark.
+        """
+        if table_name not in self.inputs:
+            return self.spark.table(table_name)
+
+        self.logger.info(f"Reading {table_name} from the result of an upstream task")
+        data = self.inputs[table_name]
+        if isinstance(data, DataFrame):
+            return data
+        return self._to_spark(data.to_pandas())
+
+    def _publish(self, table_name: str, df: DataFrame) -> DataFrame:
+        """
+        Shares a result with the downstream tasks under the name of its table when the task runs in a
+        pipeline. The dataframe is cached, so the downstream tasks and the write of the table compute it once.
+        """
+        if self.outputs is None:
+            return df
+
+        df = df.cache()
+        self.outputs[table_name] = df
+        return df
+
+    def _write_table(
+        self, df: DataFrame, table_name: str, mode: str = "overwrite", output_conf: Any = None
+    ) -> Dict[str, Any]:
+        """
+        Writes a Spark dataframe to a Delta table using the layout options of the output configuration:
+        * partition_by: columns by which the table is partitioned
+        * repartition or coalesce: number of Spark partitions, i.e. files per table partition, of the write
+        * max_records_per_file: maximum number of rows in a single file
+        * target_file_size: target size of the files in bytes, used by optimized writes and OPTIMIZE
+        * optimize_write: let Databricks bin-pack the data into files of the target size
+        * replace_where: predicate of the data that is overwritten instead of the whole table
+        * optimize and zorder_by: compact the files of the table, optionally Z-ordered, after the write
+        Returns the number of files, bytes and rows written according to the Delta log.
+        """
+        if output_conf is None:
+            output_conf = self.conf.get("output", {})
+        partition_by = output_conf.get("partition_by", [])
+
+        if "repartition" in output_conf:
+            df = df.repartition(output_conf["repartition"], *partition_by)
+        elif "coalesce" in output_conf:
+            df = df.coalesce(output_conf["coalesce"])
+
+        session_conf = {}
+        if "target_file_size" in output_conf:
+            # setting of the open source OPTIMIZE, Databricks uses the table property instead
+            session_conf["spark.databricks.delta.optimize.maxFileSize"] = str(output_conf["target_file_size"])
+        if output_conf.get("optimize_write", False):
+            session_conf["spark.databricks.delta.optimizeWrite.enabled"] = "true"
+
+        writer = df.write.format("delta").mode(mode)
+        if partition_by:
+            writer = writer.partitionBy(*partition_by)
+        if "max_records_per_file" in output_conf:
+            writer = writer.option("maxRecordsPerFile", output_conf["max_records_per_file"])
+        if mode == "overwrite" and "replace_where" in output_conf:
+            self.logger.info(f"Overwriting the data of {table_name} where {output_conf['replace_where']}")
+            writer = writer.option("replaceWhere", output_conf["replace_where"])
+
+        # the session settings only apply to this write, later tasks on the same session use their own
+        previous_conf = {key: self.spark.conf.get(key, None) for key in session_conf}
+        try:
+            for key, value in session_conf.items():
+                self.spark.conf.set(key, value)
+
+            with self.span("write_delta") as span:
+                writer.saveAsTable(table_name)
+                # read the metrics before the table property adds another commit to the history
+                write_metrics = self._report_write(table_name)
+                span.rows = write_metrics["rows"]
+                span.bytes = write_metrics["bytes"]
+                if "target_file_size" in output_conf:
+                    self.spark.sql(
+                        f"ALTER TABLE {table_name} "
+                        f"SET TBLPROPERTIES ('delta.targetFileSize' = '{output_conf['target_file_size']}')"
+                    )
+
+            self._optimize_table(table_name, output_conf)
+        finally:
+            for key, previous in previous_conf.items():
+                if previous is None:
+                    self.spark.conf.unset(key)
+                else:
+                    self.spark.conf.set(key, previous)
+        return write_metrics
+
+    def _report_write(self, table_name: str) -> Dict[str, Any]:
+        """
+        Reads the number of files, bytes and rows of the last write to a Delta table from its history.
+        """
+        from delta.tables import DeltaTable
+
+        operation = DeltaTable.forName(self.spark, table_name).history(1).collect()[0]
+        operation_metrics = operation["operationMetrics"] or {}
+
+        def metric(*names: str) -> int:
+            return sum(int(operation_metrics.get(name, 0)) for name in names)
+
+        write_metrics = {
+            "files": metric("numFiles", "numTargetFilesAdded"),
+            "bytes": metric("numOutputBytes", "numTargetBytesAdded"),
+            "rows": metric("numOutputRows", "numTargetRowsInserted", "numTargetRowsUpdated"),
+        }
+        average_size = write_metrics["bytes"] / write_metrics["files"] if write_metrics["files"] else 0
+        self.logger.info(
+            f"{operation['operation']} on {table_name} wrote {write_metrics['files']} files "
+            f"({write_metrics['rows']} rows), average file size {average_size:.0f} bytes"
+        )
+        return write_metrics
+
+    def _optimize_table(self, table_name: str, output_conf: Dict[str, Any]) -> None:
+        """
+        Compacts the files of a Delta table, Z-ordered by the zorder_by columns, when configured.
+        """
+        zorder_by = output_conf.get("zorder_by", [])
+        if not (output_conf.get("optimize", False) or zorder_by):
+            return
+
+        statement = f"OPTIMIZE {table_name}"
+        if zorder_by:
+            statement += f" ZORDER BY ({', '.join(zorder_by)})"
+        self.logger.info(f"Running {statement}")
+        with self.span("optimize"):
+            self.spark.sql(statement)
+
+    def _log_conf(self, conf: Dict[str, Any]) -> None:
         # log parameters
-        self.logger.info("Launching job with configuration parameters:")
-        for key, item in self.conf.items():
-            self.logger.info("\t Parameter: %-30s with value => %-30s" % (key, item))
+        self._log_info("Launching job with configuration parameters:")
+        for key, item in conf.items():
+            self._log_info("\t Parameter: %-30s with value => %-30s" % (key, item))
+
+    def _get_profile_conf(self) -> Dict[str, Any]:
+        profile_conf = dict(self.conf.get("profile", {}))
+        arguments = self._parse_arguments()
+        if arguments.profile:
+            profile_conf["enabled"] = True
+        if arguments.profile_dir:
+            profile_conf["output_dir"] = arguments.profile_dir
+        return profile_conf
+
+    def _get_memoize_conf(self) -> Dict[str, Any]:
+        memoize_conf = dict(self.conf.get("memoize", {}))
+        if self._parse_arguments().force:
+            memoize_conf["force"] = True
+        return memoize_conf
+
+    def _get_input_tables(self) -> List[str]:
+        """
+        Hook returning the tables read by the task, whose versions are part of the fingerprint.
+        """
+        return []
+
+    def _get_output_tables(self) -> List[str]:
+        """
+        Hook returning the tables written by the task, which store the fingerprint of the launch.
+        A task without output tables is never skipped.
+        """
+        return []
+
+    def _get_fingerprint(self) -> Any:
+        """
+        Hashes the configuration, the package version and the versions of the input tables. Returns None
+        when the task reads the result of an upstream task of a pipeline, which has no version.
+        """
+        from delta.tables import DeltaTable
+
+        input_versions = {}
+        for table_name in self._get_input_tables():
+            if table_name in self.inputs:
+                return None
+            input_versions[table_name] = (
+                DeltaTable.forName(self.spark, table_name).history(1).collect()[0]["version"]
+            )
+
+        conf = {key: value for key, value in self.conf.items() if key not in FINGERPRINT_EXCLUDED_KEYS}
+        content = json.dumps(
+            {"conf": conf, "version": package_version(), "inputs": input_versions},
+            sort_keys=True,
+            default=str,
+        )
+        return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+    def _get_stored_fingerprint(self, table_name: str) -> Any:
+        if not self.spark.catalog.tableExists(table_name):
+            return None
+        properties = self.spark.sql(f"SHOW TBLPROPERTIES {table_name}").collect()
+        return {row["key"]: row["value"] for row in properties}.get(FINGERPRINT_PROPERTY)
+
+    def _log_profile(self, profile_dir: pathlib.Path) -> None:
+        """
+        Hook to store the profile reports of a run elsewhere, e.g. as MLflow artifacts.
+        """
+        pass
+
+    def run(self) -> Any:
+        """
+        Launches the task. When profiling is enabled, with the --profile job option or the
+        profile.enabled configuration key, the launch is profiled with cProfile and tracemalloc
+        and the reports are written to a directory per run in profile.output_dir.
+        """
+        profile_conf = self._get_profile_conf()
+        if not profile_conf.get("enabled", False):
+            return self.launch()
+
+        name = self.__class__.__name__
+        timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+        profile_dir = pathlib.Path(profile_conf.get("output_dir", "profiles")) / f"{name}_{timestamp}"
+        self.logger.info(f"Profiling the run, reports are written to {profile_dir}")
+        with Profiler(profile_dir, name=name, top=profile_conf.get("top", 25)):
+            result = self.launch()
+        self._log_profile(profile_dir)
+        return result
 
     @abstractmethod
     def launch(self) -> None:
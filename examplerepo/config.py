@@ -0,0 +1,183 @@
+import os
+import copy
+import hashlib
+import pathlib
+from typing import Any, Dict, List, Tuple
+from dataclasses import dataclass
+
+import yaml
+
+# The C loader of LibYAML parses several times faster than the pure Python loader,
+# it is available when PyYAML is built against LibYAML
+YamlLoader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+# Environment variables with this prefix override configuration values, e.g.
+# EXAMPLEREPO__OUTPUT__TABLE=sales sets output.table to sales
+ENV_PREFIX = "EXAMPLEREPO__"
+
+NUMBER = (int, float)
+
+# Parsed configuration files by path: modification time, hash of the content and configuration
+_CONFIG_CACHE: Dict[str, Tuple[int, str, Dict[str, Any]]] = {}
+
+
+class ConfigError(ValueError):
+    """
+    Raised when a configuration does not match the schema of its task.
+    """
+
+
+@dataclass(frozen=True)
+class Field:
+    """
+    Schema of a single configuration value.
+
+    Parameters:
+
+    types: type or tuple of types of the value.
+    required: whether the value has to be present.
+    choices: allowed values, any value of the types when empty.
+    schema: fields of a section, for values of type dict. A section without schema may hold any key.
+
+    """
+
+    types: Any
+    required: bool = False
+    choices: Any = None
+    schema: Any = None
+
+
+def read_config(conf_file: Any) -> Dict[str, Any]:
+    """
+    Function to read a YAML configuration file. Parsed files are cached, a file is only parsed
+    again when both its modification time and the hash of its content changed. Every call
+    returns a copy, so callers can modify the configuration.
+
+    Parameters:
+
+    conf_file: path of the configuration file.
+    """
+
+    path = pathlib.Path(conf_file)
+    key = str(path.resolve())
+    modified = path.stat().st_mtime_ns
+    cached = _CONFIG_CACHE.get(key)
+    if cached is None or cached[0] != modified:
+        content = path.read_bytes()
+        digest = hashlib.sha256(content).hexdigest()
+        if cached is None or cached[1] != digest:
+            conf = yaml.load(content, Loader=YamlLoader) or {}
+        else:
+            conf = cached[2]
+        cached = (modified, digest, conf)
+        _CONFIG_CACHE[key] = cached
+    return copy.deepcopy(cached[2])
+
+
+def apply_env_overrides(conf: Dict[str, Any], environ: Any = None, schema: Any = None) -> Dict[str, Any]:
+    """
+    Function to override configuration values with environment variables. The name of a variable
+    after the prefix is the path of the value, with double underscores between the keys, and its value
+    is parsed as YAML, e.g. EXAMPLEREPO__SIMULATION__N_SERIES=100 sets simulation.n_series to 100.
+    The environment is shared by all tasks of a pipeline, so an override only applies to a task
+    whose schema has its top-level key. The configuration is only copied when it is overridden.
+
+    Parameters:
+
+    conf: configuration of a task.
+    environ: environment variables, os.environ when empty.
+    schema: fields of the top level of the configuration, all overrides are applied when empty.
+    """
+
+    environ = os.environ if environ is None else environ
+    start = len(ENV_PREFIX)
+    overrides = sorted(
+        (name, name[start:].lower().split("__"), value)
+        for name, value in environ.items()
+        if name.startswith(ENV_PREFIX)
+    )
+    if schema is not None:
+        overrides = [override for override in overrides if override[1][0] in schema]
+    if not overrides:
+        return conf
+
+    conf = copy.deepcopy(conf)
+    for name, keys, value in overrides:
+        section = conf
+        for key in keys[:-1]:
+            section = section.setdefault(key, {})
+            if not isinstance(section, dict):
+                raise ConfigError(f"{name} overrides a key of {key}, which is not a section")
+        section[keys[-1]] = yaml.load(value, Loader=YamlLoader)
+    return conf
+
+
+def _type_names(types: Any) -> str:
+    types = types if isinstance(types, tuple) else (types,)
+    return " or ".join(type_.__name__ for type_ in types)
+
+
+def _find_errors(conf: Dict[str, Any], schema: Dict[str, Field], prefix: str) -> List[str]:
+    errors = [f"{prefix}{key}: unknown key" for key in conf if key not in schema]
+    for key, field in schema.items():
+        name = f"{prefix}{key}"
+        value = conf.get(key)
+        if value is None:
+            if field.required:
+                errors.append(f"{name}: required")
+            continue
+
+        types = field.types if isinstance(field.types, tuple) else (field.types,)
+        # bool is a subclass of int, but true is not a valid number of rows
+        if not isinstance(value, types) or (isinstance(value, bool) and bool not in types):
+            errors.append(f"{name}: expected {_type_names(types)}, got {type(value).__name__}")
+        elif field.choices is not None and value not in field.choices:
+            errors.append(f"{name}: expected one of {field.choices}, got {value!r}")
+        elif field.schema is not None:
+            errors += _find_errors(value, field.schema, f"{name}.")
+    return errors
+
+
+def validate_config(conf: Dict[str, Any], schema: Dict[str, Field]) -> None:
+    """
+    Function to validate a configuration against a schema. All errors are reported at once.
+
+    Parameters:
+
+    conf: configuration of a task.
+    schema: fields of the top level of the configuration.
+    """
+
+    errors = _find_errors(conf, schema, "")
+    if errors:
+        raise ConfigError("Invalid configuration:\n" + "\n".join(f"* {error}" for error in errors))
+
+
+# Sections shared by the configurations of all tasks
+TASK_SCHEMA: Dict[str, Field] = {
+    "io": Field(dict, schema={"arrow_batch_size": Field(int)}),
+    "instrumentation": Field(
+        dict, schema={"enabled": Field(bool), "mlflow": Field(bool), "trace_file": Field(str)}
+    ),
+    "profile": Field(dict, schema={"enabled": Field(bool), "output_dir": Field(str), "top": Field(int)}),
+    "memoize": Field(dict, schema={"enabled": Field(bool), "force": Field(bool)}),
+}
+
+TABLE_SCHEMA: Dict[str, Field] = {
+    "database": Field(str),
+    "table": Field(str, required=True),
+}
+
+OUTPUT_SCHEMA: Dict[str, Field] = {
+    **TABLE_SCHEMA,
+    "persist": Field(bool),
+    "partition_by": Field(list),
+    "repartition": Field(int),
+    "coalesce": Field(int),
+    "max_records_per_file": Field(int),
+    "target_file_size": Field(int),
+    "optimize_write": Field(bool),
+    "replace_where": Field(str),
+    "optimize": Field(bool),
+    "zorder_by": Field(list),
+}
@@ -1,4 +1,9 @@
+import tempfile
+from typing import Any, List
+from pathlib import Path
+
 import pandas as pd
+import pyarrow as pa
 
 
 def combine_pandas_dataframes(
@@ -22,3 +27,91 @@ def combine_pandas_dataframes(
         dataset_overall = dataset_delta
 
     return dataset_overall
+
+
+class DataFrameAccumulator:
+    """
+    Class to combine multiple dataframes into one final dataframe for repetitive tasks.
+    Batches are collected and concatenated a single time when the accumulator is finalized,
+    instead of copying the accumulated dataset for every batch.
+
+    Parameters:
+
+    memory_budget: maximum number of bytes of buffered batches kept in memory. When the budget is
+      exceeded the buffered batches are spilled to a Parquet file on disk. No spilling when empty.
+    spill_directory: directory in which the spilled batches are stored. Every accumulator spills
+      into its own temporary subdirectory, which is removed by finalize or close. The system
+      temporary directory is used when empty.
+
+    """
+
+    def __init__(self, memory_budget: Any = None, spill_directory: Any = None) -> None:
+        self.memory_budget = memory_budget
+        self.spill_directory = spill_directory
+        self.buffered_batches: List[Any] = []
+        self.buffered_bytes = 0
+        self.spilled_files: List[Path] = []
+        self._temporary_directory: Any = None
+
+    @staticmethod
+    def _batch_size(batch: Any) -> int:
+        if isinstance(batch, pa.Table):
+            return batch.nbytes
+        return int(batch.memory_usage(index=True, deep=True).sum())
+
+    @staticmethod
+    def _to_pandas(batches: List[Any]) -> pd.DataFrame:
+        if all(isinstance(batch, pa.Table) for batch in batches):
+            return pa.concat_tables(batches).to_pandas()
+        return pd.concat([batch.to_pandas() if isinstance(batch, pa.Table) else batch for batch in batches])
+
+    def append(self, batch: Any) -> None:
+        """
+        Add a pandas dataframe or Arrow table to the accumulator. Empty batches are ignored.
+        """
+        if batch is None:
+            return
+
+        self.buffered_batches.append(batch)
+        self.buffered_bytes += self._batch_size(batch)
+
+        if self.memory_budget is not None and self.buffered_bytes > self.memory_budget:
+            self._spill()
+
+    def _spill(self) -> None:
+        if self._temporary_directory is None:
+            self._temporary_directory = tempfile.TemporaryDirectory(
+                prefix="accumulator-", dir=self.spill_directory
+            )
+
+        spill_file = Path(self._temporary_directory.name) / f"batch-{len(self.spilled_files):05d}.parquet"
+        self._to_pandas(self.buffered_batches).to_parquet(spill_file)
+        self.spilled_files.append(spill_file)
+        self.buffered_batches = []
+        self.buffered_bytes = 0
+
+    def finalize(self) -> pd.DataFrame:
+        """
+        Concatenate all spilled and buffered batches into the final dataframe.
+        Returns None when no batches were added.
+        """
+        batches = [pd.read_parquet(spill_file) for spill_file in self.spilled_files] + self.buffered_batches
+
+        dataset_overall = None
+        if len(batches) > 0:
+            dataset_overall = self._to_pandas(batches)
+
+        self.close()
+
+        return dataset_overall
+
+    def close(self) -> None:
+        """
+        Discard the buffered batches and remove the spilled batches from disk.
+        """
+        self.buffered_batches = []
+        self.buffered_bytes = 0
+        self.spilled_files = []
+        if self._temporary_directory is not None:
+            self._temporary_directory.cleanup()
+            self._temporary_directory = None
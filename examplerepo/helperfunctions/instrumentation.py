@@ -0,0 +1,101 @@
+import os
+import sys
+import json
+import time
+import resource
+from typing import Any, Dict, List
+from pathlib import Path
+
+
+def peak_rss() -> int:
+    """
+    Function to read the peak resident set size of this process in bytes.
+    """
+
+    # ru_maxrss is reported in kilobytes on Linux and in bytes on macOS
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return maxrss if sys.platform == "darwin" else maxrss * 1024
+
+
+class Span:
+    """
+    Timing span of a step of a task. Rows and bytes can be set by the code inside the span,
+    bytes transferred between pandas and Spark are added automatically by the task.
+
+    Memory is reported from the peak RSS, which is the high-water mark of the whole process:
+    process_peak_rss_bytes is the peak when the span finished, and peak_rss_increase_bytes is how
+    far the span raised it. A span that allocates less than an earlier step reports no increase,
+    the memory allocated per step is reported by the tracemalloc snapshots of the profiler.
+
+    Parameters:
+
+    name: name of the step, e.g. write_data.
+    parent: name of the enclosing span, empty for the outermost span.
+    depth: number of enclosing spans.
+
+    """
+
+    def __init__(self, name: str, parent: Any = None, depth: int = 0) -> None:
+        self.name = name
+        self.parent = parent
+        self.depth = depth
+        self.rows: Any = None
+        self.bytes: Any = None
+        self.start = time.time()
+        self.duration = 0.0
+        self.process_peak_rss_bytes = 0
+        self.peak_rss_increase_bytes = 0
+        self._start_peak_rss = peak_rss()
+        self._start_counter = time.perf_counter()
+
+    def finish(self) -> None:
+        self.duration = time.perf_counter() - self._start_counter
+        self.process_peak_rss_bytes = peak_rss()
+        self.peak_rss_increase_bytes = self.process_peak_rss_bytes - self._start_peak_rss
+
+    def metrics(self) -> Dict[str, float]:
+        """
+        Return the measurements of the span, leaving out rows and bytes when they are unknown.
+        """
+        metrics = {
+            "duration_seconds": self.duration,
+            "process_peak_rss_bytes": float(self.process_peak_rss_bytes),
+            "peak_rss_increase_bytes": float(self.peak_rss_increase_bytes),
+        }
+        if self.rows is not None:
+            metrics["rows"] = float(self.rows)
+        if self.bytes is not None:
+            metrics["bytes"] = float(self.bytes)
+        return metrics
+
+    def to_trace_event(self) -> Dict[str, Any]:
+        """
+        Return the span as a complete event of the Chrome trace format, which can be opened
+        in chrome://tracing or Perfetto. Timestamps are in microseconds.
+        """
+        return {
+            "name": self.name,
+            "cat": self.parent or "task",
+            "ph": "X",
+            "ts": int(self.start * 1e6),
+            "dur": int(self.duration * 1e6),
+            "pid": os.getpid(),
+            "tid": self.depth,
+            "args": self.metrics(),
+        }
+
+
+def write_trace(spans: List[Span], trace_file: Any) -> None:
+    """
+    Function to write the finished spans to a JSON trace file.
+
+    Parameters:
+
+    spans: finished spans of a task.
+    trace_file: path of the trace file, overwritten when it exists.
+    """
+
+    trace_path = Path(trace_file)
+    trace_path.parent.mkdir(parents=True, exist_ok=True)
+    trace = {"traceEvents": [span.to_trace_event() for span in spans], "displayTimeUnit": "ms"}
+    trace_path.write_text(json.dumps(trace, indent=2))
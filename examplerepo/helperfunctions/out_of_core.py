@@ -0,0 +1,125 @@
+from typing import Any, Dict, List, Iterable
+from pathlib import Path
+
+import numpy as np
+import pyarrow as pa
+import lightgbm as lgb
+
+
+def batch_to_numpy(batch: pa.RecordBatch, columns: List[str]) -> np.ndarray:
+    """
+    Function to convert columns of an Arrow record batch into a 2D numpy array. Columns of
+    the same type keep their type, e.g. float32 columns give a float32 array.
+
+    Parameters:
+
+    batch: Arrow record batch.
+    columns: names of the columns, in the order of the columns of the array.
+    """
+
+    return np.column_stack([batch.column(column).to_numpy(zero_copy_only=False) for column in columns])
+
+
+def spill_batches(batches: Iterable[pa.RecordBatch], spill_file: Any) -> List[pa.RecordBatch]:
+    """
+    Function to write Arrow record batches to a file on local disk and read them back memory-mapped.
+    The returned batches are backed by the file, so they are paged in from disk when they are used
+    instead of being held in memory.
+
+    Parameters:
+
+    batches: Arrow record batches with the same schema, e.g. streamed from Spark.
+    spill_file: path of the Arrow IPC file, overwritten when it exists.
+    """
+
+    spill_path = Path(spill_file)
+    spill_path.parent.mkdir(parents=True, exist_ok=True)
+    writer = None
+    for batch in batches:
+        if batch.num_rows == 0:
+            continue
+        if writer is None:
+            writer = pa.ipc.new_file(str(spill_path), batch.schema)
+        writer.write_batch(batch)
+    if writer is None:
+        return []
+    writer.close()
+
+    reader = pa.ipc.open_file(pa.memory_map(str(spill_path), "r"))
+    return [reader.get_batch(index) for index in range(reader.num_record_batches)]
+
+
+class ArrowSequence(lgb.Sequence):
+    """
+    LightGBM sequence over the feature columns of a single Arrow record batch, used to construct a
+    LightGBM dataset batch by batch from memory-mapped batches. LightGBM samples single rows to find
+    the bins of the features, for which the batch is converted to numpy once; the conversion is shared
+    by the sequences of a dataset so only the batch that is being sampled is held in memory.
+
+    Parameters:
+
+    batch: Arrow record batch.
+    columns: names of the feature columns.
+    cache: conversion of the batch that was sampled last, shared by the sequences of a dataset.
+    batch_size: number of rows that LightGBM reads at a time when it constructs the dataset.
+
+    """
+
+    def __init__(
+        self, batch: pa.RecordBatch, columns: List[str], cache: Dict[str, Any], batch_size: int = 4096
+    ) -> None:
+        self.batch = batch
+        self.columns = columns
+        self.cache = cache
+        self.batch_size = batch_size
+
+    @classmethod
+    def from_batches(
+        cls, batches: List[pa.RecordBatch], columns: List[str], batch_size: int = 4096
+    ) -> List["ArrowSequence"]:
+        cache: Dict[str, Any] = {}
+        return [cls(batch, columns, cache, batch_size) for batch in batches]
+
+    def __len__(self) -> int:
+        return self.batch.num_rows
+
+    def __getitem__(self, idx: Any) -> np.ndarray:
+        if isinstance(idx, slice):
+            start, stop, _ = idx.indices(self.batch.num_rows)
+            return batch_to_numpy(self.batch.slice(start, stop - start), self.columns)
+
+        if self.cache.get("sequence") is not self:
+            self.cache["sequence"] = self
+            # LightGBM finds the bins on samples in double precision
+            self.cache["rows"] = batch_to_numpy(self.batch, self.columns).astype(np.float64)
+        return self.cache["rows"][idx]
+
+
+class RunningR2:
+    """
+    Coefficient of determination that is accumulated over batches of targets and predictions,
+    using the pairwise update of the mean and the sum of squared deviations of the targets.
+    """
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.mean = 0.0
+        self.total_squares = 0.0
+        self.residual_squares = 0.0
+
+    def update(self, y_true: np.ndarray, y_pred: np.ndarray) -> None:
+        y_true = np.asarray(y_true, dtype=np.float64)
+        count = len(y_true)
+        if count == 0:
+            return
+
+        batch_mean = y_true.mean()
+        delta = batch_mean - self.mean
+        total = self.count + count
+        self.total_squares += ((y_true - batch_mean) ** 2).sum() + delta**2 * self.count * count / total
+        self.mean += delta * count / total
+        self.count = total
+        self.residual_squares += ((y_true - np.asarray(y_pred, dtype=np.float64)) ** 2).sum()
+
+    def score(self) -> float:
+        return 1.0 - self.residual_squares / self.total_squares
@@ -0,0 +1,88 @@
+import os
+import json
+import time
+import hashlib
+from typing import Any
+from pathlib import Path
+
+import pandas as pd
+
+
+class ParquetCache:
+    """
+    Content-addressed on-disk cache that stores pandas dataframes as Parquet files.
+    Entries are addressed by a hash of the parameters that produced them and are evicted
+    when they are older than the TTL or when the cache grows beyond its maximum size.
+
+    Parameters:
+
+    directory: directory in which the cached dataframes are stored.
+    ttl: maximum age of an entry in seconds. Entries never expire on age when empty.
+    max_bytes: maximum total size of the cache in bytes. The oldest entries are evicted first.
+      No size limit when empty.
+
+    """
+
+    def __init__(self, directory: Any, ttl: Any = 24 * 60 * 60, max_bytes: Any = 1024**3) -> None:
+        self.directory = Path(directory)
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    @staticmethod
+    def create_key(**parameters: Any) -> str:
+        """
+        Create the cache key for a set of (JSON serialisable) parameters.
+        """
+        content = json.dumps(parameters, sort_keys=True, default=str)
+        return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.directory / f"{key}.parquet"
+
+    def get(self, key: str, expires: bool = True) -> Any:
+        """
+        Return the cached dataframe for the key, or None when there is no (valid) entry.
+        With expires set to False the TTL is ignored, e.g. for data that never changes.
+        """
+        path = self._path(key)
+        try:
+            age = time.time() - path.stat().st_mtime
+            if expires and self.ttl is not None and age > self.ttl:
+                path.unlink()
+                return None
+            return pd.read_parquet(path)
+        except FileNotFoundError:
+            return None
+
+    def put(self, key: str, data: pd.DataFrame) -> None:
+        """
+        Store the dataframe under the key and evict old entries when the cache is too large.
+        """
+        path = self._path(key)
+        temporary_path = path.with_suffix(f".{os.getpid()}.{time.monotonic_ns()}.tmp")
+        data.to_parquet(temporary_path)
+        os.replace(temporary_path, path)
+        self.evict()
+
+    def evict(self) -> None:
+        """
+        Remove the oldest entries until the cache is within its maximum size.
+        """
+        if self.max_bytes is None:
+            return
+
+        entries = []
+        for path in self.directory.glob("*.parquet"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+        total_bytes = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total_bytes <= self.max_bytes:
+                break
+            path.unlink(missing_ok=True)
+            total_bytes -= size
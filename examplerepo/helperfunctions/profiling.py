@@ -0,0 +1,73 @@
+import io
+import pstats
+import cProfile
+import tracemalloc
+from typing import Any, List
+from pathlib import Path
+
+
+class Profiler:
+    """
+    Context manager that profiles the enclosed code with cProfile and traces its memory
+    allocations with tracemalloc. On exit it writes to the output directory:
+    * <name>.pstats: raw cProfile statistics, e.g. for snakeviz, flameprof or gprof2dot
+    * <name>_cumulative.txt: the functions with the highest cumulative time
+    * <name>_allocations.txt: the source lines that allocated most of the memory still in use,
+      and the peak of the traced memory
+
+    Parameters:
+
+    output_dir: directory in which the reports are written.
+    name: prefix of the report files.
+    top: number of functions and source lines in the text reports.
+    frames: number of frames stored per allocation, more frames make tracing slower.
+
+    """
+
+    def __init__(self, output_dir: Any, name: str, top: int = 25, frames: int = 1) -> None:
+        self.output_dir = Path(output_dir)
+        self.name = name
+        self.top = top
+        self.frames = frames
+        self.files: List[Path] = []
+        self._profile = cProfile.Profile()
+
+    def __enter__(self) -> "Profiler":
+        tracemalloc.start(self.frames)
+        self._profile.enable()
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        self._profile.disable()
+        snapshot = tracemalloc.take_snapshot()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        self._write_stats()
+        self._write_allocations(snapshot, peak)
+
+    def _write_stats(self) -> None:
+        stats_file = self.output_dir / f"{self.name}.pstats"
+        self._profile.dump_stats(str(stats_file))
+
+        report = io.StringIO()
+        pstats.Stats(self._profile, stream=report).sort_stats("cumulative").print_stats(self.top)
+        report_file = self.output_dir / f"{self.name}_cumulative.txt"
+        report_file.write_text(report.getvalue())
+        self.files += [stats_file, report_file]
+
+    def _write_allocations(self, snapshot: tracemalloc.Snapshot, peak: int) -> None:
+        snapshot = snapshot.filter_traces(
+            [
+                tracemalloc.Filter(False, tracemalloc.__file__),
+                tracemalloc.Filter(False, cProfile.__file__),
+            ]
+        )
+        lines = [f"Peak traced memory: {peak / 1024**2:.1f} MiB", f"Top {self.top} allocations:"]
+        for statistic in snapshot.statistics("lineno")[: self.top]:
+            lines.append(str(statistic))
+
+        allocations_file = self.output_dir / f"{self.name}_allocations.txt"
+        allocations_file.write_text("\n".join(lines) + "\n")
+        self.files.append(allocations_file)
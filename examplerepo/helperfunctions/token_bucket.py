@@ -0,0 +1,40 @@
+import time
+import threading
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket to limit the rate of requests shared by multiple workers.
+
+    Parameters:
+
+    rate: number of tokens added to the bucket per second.
+    capacity: maximum number of tokens in the bucket, i.e. the size of a burst.
+
+    """
+
+    def __init__(self, rate: float, capacity: float = 1.0) -> None:
+        assert rate > 0, "The rate of the token bucket needs to be positive"
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self, tokens: float = 1.0) -> None:
+        """
+        Block until the requested number of tokens is available and take them from the bucket.
+        """
+        while True:
+            with self.lock:
+                self._refill()
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return
+                wait = (tokens - self.tokens) / self.rate
+            time.sleep(wait)
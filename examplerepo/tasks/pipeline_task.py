@@ -0,0 +1,191 @@
+import time
+import importlib
+from typing import Any, Dict, List, Type, Tuple
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+
+import pyarrow as pa
+
+from pyspark.sql import DataFrame
+
+from examplerepo.common import Task
+from examplerepo.config import TASK_SCHEMA, Field, ConfigError, validate_config, apply_env_overrides
+
+
+def merge_conf(conf: Dict[str, Any], overrides: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Function to override the values of a configuration, merging nested sections key by key.
+
+    Parameters:
+
+    conf: configuration, e.g. read from the configuration file of a task.
+    overrides: values that replace or extend those of the configuration.
+    """
+
+    merged = dict(conf)
+    for key, value in overrides.items():
+        if isinstance(value, dict) and isinstance(merged.get(key), dict):
+            merged[key] = merge_conf(merged[key], value)
+        else:
+            merged[key] = value
+    return merged
+
+
+class PipelineTask(Task):
+    """
+    Task that runs a DAG of tasks in a single process, sharing the SparkSession of the pipeline.
+    Every entry of the tasks section names the task class (task), its configuration (conf_file
+    and/or conf, the latter overriding the former) and the tasks it depends on (depends_on).
+    A task starts as soon as the tasks it depends on are finished, so independent tasks run
+    concurrently, up to max_workers at a time.
+
+    The results a task publishes are passed to the tasks that depend on it directly, which use
+    them instead of reading the table of the same name. A result is shared as a cached Spark
+    dataframe, or as an Arrow table on the driver when the task sets share to "arrow". Whether
+    the result is also written to its table is up to the task, e.g. output.persist of the ETL task.
+    """
+
+    SHARE_FORMATS = ["dataframe", "arrow"]
+    CONFIG_SCHEMA: Dict[str, Field] = {
+        **TASK_SCHEMA,
+        "max_workers": Field(int),
+        "tasks": Field(dict, required=True),
+    }
+    DAG_TASK_SCHEMA: Dict[str, Field] = {
+        "task": Field(str, required=True),
+        "conf_file": Field(str),
+        "conf": Field(dict),
+        "depends_on": Field(list),
+        "share": Field(str, choices=SHARE_FORMATS),
+    }
+
+    def __init__(self, spark: Any = None, init_conf: Any = None, inputs: Any = None) -> None:
+        super().__init__(spark, init_conf, inputs)
+        # tasks of the last launch by name, with their spans and the results they published
+        self.tasks: Dict[str, Task] = {}
+
+    def _get_dag(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Validates the DAG and the configurations of all its tasks, so a configuration error stops the
+        pipeline before the first task starts.
+        """
+        dag: Dict[str, Dict[str, Any]] = self.conf["tasks"]
+        for name, task_conf in dag.items():
+            try:
+                validate_config(task_conf, self.DAG_TASK_SCHEMA)
+                task_class, conf = self._get_task_conf(name, task_conf)
+                task_class.validate_conf(apply_env_overrides(conf, schema=task_class.CONFIG_SCHEMA))
+            except ConfigError as error:
+                raise ConfigError(f"Task {name}: {error}") from error
+            for dependency in task_conf.get("depends_on", []):
+                if dependency not in dag:
+                    raise ConfigError(f"Task {name} depends on the unknown task {dependency}")
+        self._sort_tasks(dag)
+        return dag
+
+    @staticmethod
+    def _sort_tasks(dag: Dict[str, Dict[str, Any]]) -> List[str]:
+        """
+        Orders the tasks such that every task comes after the tasks it depends on.
+        """
+        order: List[str] = []
+        while len(order) < len(dag):
+            ready = [
+                name
+                for name, task_conf in dag.items()
+                if name not in order
+                and all(dependency in order for dependency in task_conf.get("depends_on", []))
+            ]
+            if not ready:
+                cycle = sorted(set(dag) - set(order))
+                raise ConfigError(f"The dependencies of the tasks {cycle} contain a cycle")
+            order += ready
+        return order
+
+    def _get_task_conf(self, name: str, task_conf: Dict[str, Any]) -> Tuple[Type[Task], Dict[str, Any]]:
+        module_name, class_name = task_conf["task"].rsplit(".", 1)
+        task_class = getattr(importlib.import_module(module_name), class_name)
+
+        conf = self._read_config(task_conf["conf_file"]) if "conf_file" in task_conf else {}
+        conf = merge_conf(conf, task_conf.get("conf", {}))
+        if not conf:
+            # an empty configuration would make the task read the --conf-file of the pipeline
+            raise ConfigError(f"Task {name} needs a conf_file or conf")
+        return task_class, conf
+
+    def _create_task(self, name: str, task_conf: Dict[str, Any], inputs: Dict[str, Any]) -> Task:
+        task_class, conf = self._get_task_conf(name, task_conf)
+        task = task_class(self.spark, conf, inputs=inputs)
+        task.outputs = {}
+        return task
+
+    def _run_task(self, name: str, task_conf: Dict[str, Any], inputs: Dict[str, Any]) -> Task:
+        """
+        Launches a task in a thread of the pipeline. The Spark jobs of the task run in a scheduler
+        pool of its own, so concurrent tasks share the executors when the FAIR scheduler is enabled.
+        """
+        spark_context = self.spark.sparkContext
+        spark_context.setLocalProperty("spark.scheduler.pool", name)
+        spark_context.setJobGroup(name, f"Pipeline task {name}")
+
+        task = self._create_task(name, task_conf, inputs)
+        self.logger.info(f"Starting task {name} with inputs {sorted(inputs)}")
+        start = time.perf_counter()
+        task.launch()
+
+        if task_conf.get("share", "dataframe") == "arrow":
+            for table_name, df in task.outputs.items():
+                task.outputs[table_name] = pa.Table.from_pandas(task._to_pandas(df), preserve_index=False)
+                df.unpersist()
+        self.logger.info(
+            f"Finished task {name} in {time.perf_counter() - start:.3f}s, " f"sharing {sorted(task.outputs)}"
+        )
+        return task
+
+    def _run_pipeline(self) -> Dict[str, Task]:
+        dag = self._get_dag()
+        order = self._sort_tasks(dag)
+        max_workers = self.conf.get("max_workers", len(dag))
+        self.logger.info(f"Running {len(dag)} tasks with at most {max_workers} at a time")
+
+        finished: Dict[str, Task] = {}
+        running: Dict[Future, str] = {}
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            while len(finished) < len(dag):
+                for name in order:
+                    dependencies = dag[name].get("depends_on", [])
+                    if name in finished or name in running.values():
+                        continue
+                    if all(dependency in finished for dependency in dependencies):
+                        inputs = {
+                            table_name: result
+                            for dependency in dependencies
+                            for table_name, result in finished[dependency].outputs.items()
+                        }
+                        running[executor.submit(self._run_task, name, dag[name], inputs)] = name
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    # a failing task stops the pipeline once the running tasks are finished
+                    finished[running.pop(future)] = future.result()
+
+        return finished
+
+    def launch(self) -> None:
+        self.logger.info("Launching pipeline")
+        with self.span("launch"):
+            self.tasks = self._run_pipeline()
+        for task in self.tasks.values():
+            for result in task.outputs.values():
+                if isinstance(result, DataFrame):
+                    result.unpersist()
+        self.logger.info("Pipeline finished!")
+
+
+def entrypoint() -> None:  # pragma: no cover
+    task = PipelineTask()
+    task.run()
+
+
+# if you're using spark_python_task, you'll need the __main__ block to start the code execution
+if __name__ == "__main__":
+    entrypoint()
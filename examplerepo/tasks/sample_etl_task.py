@@ -1,49 +1,196 @@
+from typing import Any, Dict, List, Iterator
+from functools import partial
+
 import numpy as np
 import pandas as pd
 
-from examplerepo.common import Task
-from examplerepo.testdata.create.simulation import simulate_timeseries
+from pyspark.sql import DataFrame
+
+from examplerepo.common import Task, traced, memoized
+from examplerepo.config import NUMBER, TASK_SCHEMA, OUTPUT_SCHEMA, Field
+from examplerepo.testdata.create.simulation import (
+    simulate_timeseries,
+    simulate_timeseries_batch,
+    simulate_timeseries_chunks,
+)
+
+# Columns of the parameters table that may hold a value per series
+SERIES_PARAMETERS = ["scale", "promotion_uplift", "promotion_frequency"]
+
+
+def simulate_partitions(iterator: Iterator[pd.DataFrame], settings: Dict[str, Any]) -> Iterator[pd.DataFrame]:
+    """
+    Function that runs on the executors and simulates all series of a partition of the
+    series-parameter table. Used with mapInPandas.
+
+    Parameters:
+
+    iterator: batches of the series-parameter table, containing at least a series_id column.
+    settings: simulation settings shared by all series.
+    """
+
+    for parameters in iterator:
+        series_settings = dict(settings)
+        for column in SERIES_PARAMETERS:
+            if column in parameters.columns:
+                series_settings[column] = parameters[column].to_numpy()
+
+        yield simulate_timeseries_batch(
+            n_series=len(parameters.index), series_ids=parameters["series_id"].to_numpy(), **series_settings
+        )
 
 
 class SampleSimulatedDataTask(Task):
+    SIMULATION_SCHEMA: str = (
+        "series_id long, time long, sales_total float, sales_arma float, promotion_timing float"
+    )
+    DEFAULT_SIMULATION: Dict[str, Any] = {
+        "timerange": 208,
+        "fullyear": 52,
+        "frequencies": [1, 2],
+        "amplitudes": [4, 4],
+        "arparams": [0.75, -0.25],
+        "maparams": [0.65, 0.35],
+        "scale": 0.4,
+        "promotion": True,
+        "promotion_uplift": 0.5,
+        "promotion_frequency": 5,
+        "seed": 12345,
+    }
+
+    CONFIG_SCHEMA: Dict[str, Field] = {
+        **TASK_SCHEMA,
+        "output": Field(dict, required=True, schema=OUTPUT_SCHEMA),
+        "simulation": Field(
+            dict,
+            schema={
+                "timerange": Field(int),
+                "fullyear": Field(int),
+                "frequencies": Field(list),
+                "amplitudes": Field(list),
+                "arparams": Field(list),
+                "maparams": Field(list),
+                "scale": Field(NUMBER),
+                "promotion": Field(bool),
+                "promotion_uplift": Field(NUMBER),
+                "promotion_frequency": Field(int),
+                "seed": Field(int),
+                "mode": Field(str, choices=["local", "distributed", "chunked"]),
+                "chunksize": Field(int),
+                "n_series": Field(int),
+                "series_per_partition": Field(int),
+                "parameters_table": Field(str),
+            },
+        ),
+    }
+
+    def _get_simulation_settings(self) -> Dict[str, Any]:
+        simulation_conf = self.conf.get("simulation", {})
+        return {key: simulation_conf.get(key, value) for key, value in self.DEFAULT_SIMULATION.items()}
+
+    @traced("simulate")
     def simulate_date(self) -> pd.DataFrame:
-        arparams = np.array([0.75, -0.25])
-        maparams = np.array([0.65, 0.35])
-
-        simulated_timeseries = simulate_timeseries(
-            timerange=208,
-            fullyear=52,
-            frequencies=[1, 2],
-            amplitudes=[4, 4],
-            arparams=arparams,
-            maparams=maparams,
-            scale=0.4,
-            promotion=True,
-            promotion_uplift=0.5,
-            promotion_frequency=5,
-            seed=12345,
-        )
+        settings = self._get_simulation_settings()
+        settings["arparams"] = np.array(settings["arparams"])
+        settings["maparams"] = np.array(settings["maparams"])
+
+        simulated_timeseries = simulate_timeseries(**settings)
 
         return simulated_timeseries
 
-    def _write_data(self) -> None:
+    def simulate_chunks(self) -> Iterator[pd.DataFrame]:
+        settings = self._get_simulation_settings()
+        settings["arparams"] = np.array(settings["arparams"])
+        settings["maparams"] = np.array(settings["maparams"])
+        chunksize = self.conf.get("simulation", {}).get("chunksize", 100000)
+
+        return simulate_timeseries_chunks(chunksize=chunksize, **settings)
+
+    def _get_series_parameters(self) -> DataFrame:
+        simulation_conf = self.conf.get("simulation", {})
+        if "parameters_table" in simulation_conf:
+            self.logger.info(f"Reading series parameters from {simulation_conf['parameters_table']}")
+            return self._read_table(simulation_conf["parameters_table"])
+
+        n_series = simulation_conf.get("n_series", 1)
+        series_per_partition = simulation_conf.get("series_per_partition", 1000)
+        n_partitions = max(1, -(-n_series // series_per_partition))
+        return self.spark.range(0, n_series, numPartitions=n_partitions).withColumnRenamed("id", "series_id")
+
+    def simulate_distributed(self) -> DataFrame:
+        settings = self._get_simulation_settings()
+        parameters = self._get_series_parameters()
+        self.logger.info(
+            f"Simulating series on the executors in {parameters.rdd.getNumPartitions()} partitions"
+        )
+        return parameters.mapInPandas(
+            partial(simulate_partitions, settings=settings), schema=self.SIMULATION_SCHEMA
+        )
+
+    def _get_table_name(self) -> str:
         db = self.conf["output"].get("database", "default")
         table = self.conf["output"]["table"]
-        self.logger.info(f"Writing simulated dataset to {db}.{table}")
-        _data: pd.DataFrame = self.simulate_date()
-        df = self.spark.createDataFrame(_data)
-        df.write.format("delta").mode("overwrite").saveAsTable(f"{db}.{table}")
+        return f"{db}.{table}"
+
+    def _get_input_tables(self) -> List[str]:
+        simulation_conf = self.conf.get("simulation", {})
+        return [simulation_conf["parameters_table"]] if "parameters_table" in simulation_conf else []
+
+    def _get_output_tables(self) -> List[str]:
+        return [self._get_table_name()] if self.conf["output"].get("persist", True) else []
+
+    def _write_data(self) -> None:
+        table_name = self._get_table_name()
+        self.logger.info(f"Writing simulated dataset to {table_name}")
+        mode = self.conf.get("simulation", {}).get("mode", "local")
+        if mode == "chunked":
+            self._write_chunks(table_name)
+            return
+
+        if mode == "distributed":
+            df = self.simulate_distributed()
+        else:
+            _data: pd.DataFrame = self.simulate_date()
+            df = self._to_spark(_data.reset_index())
+        df = self._publish(table_name, df)
+        if not self.conf["output"].get("persist", True):
+            self.logger.info("Dataset is only shared with the downstream tasks, not written")
+            return
+
+        self._write_table(df, table_name)
+        self.logger.info("Dataset successfully written")
+
+    def _write_chunks(self, table_name: str) -> None:
+        """
+        Streams the simulated series into the table chunk by chunk, so only a single chunk is
+        held in memory. The first chunk overwrites the table, the others are appended. The table
+        is optimized once after the last chunk. The table is always written in this mode. The time
+        index of the chunks is written as a column, as the ordering of the rows is not kept.
+        """
+        output_conf = self.conf["output"]
+        chunk_conf = {
+            key: value for key, value in output_conf.items() if key not in ["optimize", "zorder_by"]
+        }
+        write_mode = "overwrite"
+        for chunk in self.simulate_chunks():
+            df = self._to_spark(chunk.reset_index())
+            self._write_table(df, table_name, mode=write_mode, output_conf=chunk_conf)
+            write_mode = "append"
+        self._optimize_table(table_name, output_conf)
+        self._publish(table_name, self.spark.table(table_name))
         self.logger.info("Dataset successfully written")
 
+    @memoized
     def launch(self) -> None:
         self.logger.info("Launching sample ETL job")
-        self._write_data()
+        with self.span("launch"):
+            self._write_data()
         self.logger.info("Sample ETL job finished!")
 
 
 def entrypoint() -> None:  # pragma: no cover
     task = SampleSimulatedDataTask()
-    task.launch()
+    task.run()
 
 
 # if you're using spark_python_task, you'll need the __main__ block to start the code execution
@@ -1,55 +1,565 @@
-from typing import Any
+import os
+import time
+import tempfile
+from typing import TYPE_CHECKING, Any, Dict, List, Tuple, Callable
+from pathlib import Path
+from functools import partial, cached_property
 
-import mlflow
+import numpy as np
 import pandas as pd
-import mlflow.sklearn
-from sklearn.metrics import r2_score
-from sklearn.ensemble import RandomForestRegressor
-from sklearn.pipeline import Pipeline
-from sklearn.preprocessing import StandardScaler
-from sklearn.model_selection import train_test_split
 
-from examplerepo.common import Task
+from pyspark import StorageLevel
+from pyspark.sql import Window, DataFrame
+from pyspark.sql import functions as F
+
+from examplerepo.common import Task, traced
+from examplerepo.config import NUMBER, TASK_SCHEMA, TABLE_SCHEMA, Field, ConfigError
+
+# mlflow, sklearn, lightgbm and joblib are imported where they are used to keep the startup of the task fast
+if TYPE_CHECKING:  # pragma: no cover
+    from sklearn.pipeline import Pipeline
+
+
+def create_random_forest(n_jobs: Any = None, params: Any = None) -> Any:
+    """
+    Function to create the random forest of scikit-learn, the default estimator backend.
+
+    Parameters:
+
+    n_jobs: number of threads, a single thread when empty.
+    params: parameters of RandomForestRegressor.
+    """
+
+    from sklearn.ensemble import RandomForestRegressor
+
+    return RandomForestRegressor(n_jobs=n_jobs, **(params or {}))
+
+
+def create_lightgbm(n_jobs: Any = None, params: Any = None) -> Any:
+    """
+    Function to create the histogram-based gradient boosting of LightGBM, which bins the features
+    once and builds the trees on the bins with multiple threads.
+
+    Parameters:
+
+    n_jobs: number of threads, all cores when empty.
+    params: parameters of LGBMRegressor.
+    """
+
+    from lightgbm import LGBMRegressor
+
+    threads = {} if n_jobs is None else {"n_jobs": n_jobs}
+    return LGBMRegressor(**{"verbosity": -1, **threads, **(params or {})})
+
+
+# Estimator backends of the ML task by name,
+# creating an estimator from the number of threads and its parameters
+ESTIMATORS: Dict[str, Callable[..., Any]] = {
+    "random_forest": create_random_forest,
+    "lightgbm": create_lightgbm,
+}
+
+
+def get_features(data: pd.DataFrame, columns: List[str]) -> pd.DataFrame:
+    """
+    Function to select the features of the model as float32 columns. The simulated data is stored
+    as float32 already, and both backends train on float32, so the features are not copied to float64.
+
+    Parameters:
+
+    data: dataset of the model.
+    columns: columns that are not features, e.g. the target.
+    """
+
+    return data.drop(columns, axis=1).astype(np.float32, copy=False)
+
+
+def fit_and_score(
+    pipeline: "Pipeline",
+    params: Dict[str, Any],
+    X_train: pd.DataFrame,
+    X_test: pd.DataFrame,
+    y_train: pd.Series,
+    y_test: pd.Series,
+) -> Dict[str, Any]:
+    """
+    Function to fit a copy of the pipeline with a set of hyperparameters and score it on the test set.
+    Runs on a local worker process or on a Spark executor during the hyperparameter search.
+
+    Parameters:
+
+    pipeline: unfitted pipeline that is cloned for the trial.
+    params: hyperparameters of the trial, in the pipeline's set_params format.
+    X_train, X_test, y_train, y_test: train and test split of the dataset.
+    """
+
+    from sklearn.base import clone
+    from sklearn.metrics import r2_score
+
+    start = time.time()
+    candidate = clone(pipeline).set_params(**params)
+    candidate.fit(X_train, y_train)
+    r2_result = r2_score(y_test, candidate.predict(X_test))
+    return {"params": params, "r2": r2_result, "fit_time": time.time() - start}
+
+
+def train_group(
+    data: pd.DataFrame, pipeline: "Pipeline", series_key: str, target_column: str, seed: Any = None
+) -> pd.DataFrame:
+    """
+    Function to train and score the pipeline on the data of a single series.
+    Runs on the Spark executors, used with applyInPandas.
+
+    Parameters:
+
+    data: all rows of a single series.
+    pipeline: unfitted pipeline that is cloned for the series.
+    series_key: column that identifies the series.
+    target_column: column that contains the target of the model.
+    seed: fixed seed for the train/test split.
+    """
+
+    from sklearn.model_selection import train_test_split
+
+    X = get_features(data, [target_column, series_key])
+    y = data[target_column]
+    X_train, X_test, y_train, y_test = train_test_split(X, y, random_state=seed)
+    result = fit_and_score(pipeline, {}, X_train, X_test, y_train, y_test)
+    return pd.DataFrame(
+        {
+            series_key: [data[series_key].iloc[0]],
+            "n_rows": [len(data.index)],
+            "r2": [result["r2"]],
+            "fit_time": [result["fit_time"]],
+        }
+    )
 
 
 class SampleModelTask(Task):
     TARGET_COLUMN: str = "sales_total"
+    CONFIG_SCHEMA: Dict[str, Field] = {
+        **TASK_SCHEMA,
+        "input": Field(
+            dict,
+            required=True,
+            schema={
+                **TABLE_SCHEMA,
+                "columns": Field(list),
+                "filters": Field(list),
+                "sample": Field(
+                    dict,
+                    schema={
+                        "fraction": Field(NUMBER, required=True),
+                        "stratify_by": Field(str),
+                        "seed": Field(int),
+                    },
+                ),
+            },
+        ),
+        "experiment": Field(str, required=True),
+        "training": Field(
+            dict,
+            schema={
+                "mode": Field(str, choices=["single", "search", "grouped", "incremental"]),
+                "estimator": Field(str, choices=list(ESTIMATORS)),
+                "params": Field(dict),
+                "series_key": Field(str),
+                "n_jobs": Field(int),
+                "seed": Field(int),
+                "metrics_table": Field(str),
+                "incremental": Field(
+                    dict,
+                    schema={
+                        "estimator": Field(str, choices=["sgd", "lightgbm"]),
+                        "test_fraction": Field(NUMBER),
+                        "epochs": Field(int),
+                        "num_boost_round": Field(int),
+                        "params": Field(dict),
+                        "spill_dir": Field(str),
+                    },
+                ),
+            },
+        ),
+        "search": Field(
+            dict,
+            schema={
+                "backend": Field(str, choices=["local", "spark"]),
+                "n_jobs": Field(int),
+                "max_trials": Field(int),
+                "timeout_seconds": Field(NUMBER),
+                "seed": Field(int),
+                "param_distributions": Field(dict, required=True),
+            },
+        ),
+    }
 
-    def _read_data(self) -> pd.DataFrame:
+    @classmethod
+    def validate_conf(cls, conf: Dict[str, Any]) -> None:
+        super().validate_conf(conf)
+        training_conf = conf.get("training", {})
+        # the models of the grouped mode are only reported through their per-series metrics
+        if training_conf.get("mode") == "grouped" and "metrics_table" not in training_conf:
+            raise ConfigError("Invalid configuration:\n* training.metrics_table: required in grouped mode")
+
+    @cached_property
+    def experiment_id(self) -> str:
+        import mlflow
+
+        # runs name their experiment explicitly, the active experiment is shared by the tasks of a pipeline
+        return mlflow.set_experiment(self.conf["experiment"]).experiment_id
+
+    def _get_input_table(self) -> str:
         db = self.conf["input"].get("database", "default")
         table = self.conf["input"]["table"]
-        self.logger.info(f"Reading timeseries dataset from {db}.{table}")
-        _data: pd.DataFrame = self.spark.table(f"{db}.{table}").toPandas()
+        return f"{db}.{table}"
+
+    def _read_input(self, required_columns: Any = None) -> DataFrame:
+        """
+        Reads the input table with the column selection (columns), row filters (filters) and
+        sampling (sample) of the input configuration. These are part of the Spark plan, so
+        filters on partition columns prune files and only the selected data is collected.
+        The target column and the required columns are always selected.
+        """
+        input_conf = self.conf["input"]
+        df = self._read_table(self._get_input_table())
+
+        for predicate in input_conf.get("filters", []):
+            self.logger.info(f"Filtering the input on {predicate}")
+            df = df.where(predicate)
+
+        if "columns" in input_conf:
+            columns = list(
+                dict.fromkeys(input_conf["columns"] + [self.TARGET_COLUMN] + (required_columns or []))
+            )
+            df = df.select(*columns)
+
+        if "sample" in input_conf:
+            df = self._sample_input(df, input_conf["sample"])
+
+        return df
+
+    def _sample_input(self, df: DataFrame, sample_conf: Dict[str, Any]) -> DataFrame:
+        """
+        Samples a fraction of the rows. With stratify_by, the fraction is taken from every
+        stratum separately, using a random order within the stratum.
+        """
+        fraction = sample_conf["fraction"]
+        seed = sample_conf.get("seed")
+        stratify_by = sample_conf.get("stratify_by")
+        if not stratify_by:
+            self.logger.info(f"Sampling {fraction} of the input")
+            return df.sample(fraction=fraction, seed=seed)
+
+        self.logger.info(f"Sampling {fraction} of the input per {stratify_by}")
+        stratum = Window.partitionBy(stratify_by)
+        return (
+            df.withColumn("_sample_rank", F.row_number().over(stratum.orderBy(F.rand(seed))))
+            .withColumn("_sample_size", F.ceil(F.count(F.lit(1)).over(stratum) * fraction))
+            .where(F.col("_sample_rank") <= F.col("_sample_size"))
+            .drop("_sample_rank", "_sample_size")
+        )
+
+    @traced("read_data")
+    def _read_data(self) -> pd.DataFrame:
+        table_name = self._get_input_table()
+        self.logger.info(f"Reading timeseries dataset from {table_name}")
+        _data: pd.DataFrame = self._to_pandas(self._read_input())
         self.logger.info(f"Loaded dataset, total size: {len(_data)}")
         return _data
 
-    @staticmethod
-    def _get_pipeline() -> Pipeline:
-        pipeline = Pipeline([("scaler", StandardScaler()), ("random_forest", RandomForestRegressor())])
+    def _get_pipeline(self) -> "Pipeline":
+        """
+        Creates the pipeline of the estimator backend (training.estimator) with its parameters
+        (training.params) and number of threads (training.n_jobs). The pipeline step is named after
+        the backend, e.g. random_forest__max_depth in the param_distributions of the search.
+        """
+        from sklearn.pipeline import Pipeline
+
+        training_conf = self.conf.get("training", {})
+        estimator = training_conf.get("estimator", "random_forest")
+        create_estimator = ESTIMATORS[estimator]
+        pipeline = Pipeline(
+            [
+                (
+                    estimator,
+                    create_estimator(n_jobs=training_conf.get("n_jobs"), params=training_conf.get("params")),
+                )
+            ]
+        )
         return pipeline
 
+    def _evaluate_trials(self, pipeline: "Pipeline", trials: List[Dict[str, Any]], data: tuple) -> List[Dict]:
+        from joblib import Parallel, delayed
+
+        search_conf = self.conf["search"]
+        if search_conf.get("backend", "local") == "spark":
+            data_broadcast = self.spark.sparkContext.broadcast(data)
+            return (
+                self.spark.sparkContext.parallelize(trials, len(trials))
+                .map(lambda params: fit_and_score(pipeline, params, *data_broadcast.value))
+                .collect()
+            )
+
+        return Parallel(n_jobs=min(len(trials), os.cpu_count() or 1))(
+            delayed(fit_and_score)(pipeline, params, *data) for params in trials
+        )
+
+    @traced("search")
+    def _search_pipeline(self, pipeline: "Pipeline", data: tuple) -> Dict[str, Any]:
+        """
+        Evaluates candidate hyperparameters in parallel batches, either on local cores or on the
+        Spark executors, and logs every trial as a nested MLflow run. The search stops when the
+        trial budget (max_trials) or the time budget (timeout_seconds) is used up. The trials run
+        in parallel themselves, so every trial fits its estimator on a single thread. When no trial
+        finished, the default parameters are kept.
+        """
+        import mlflow
+        from sklearn.base import clone
+        from sklearn.model_selection import ParameterSampler
+
+        # Parallel trials with multithreaded estimators would oversubscribe the cores
+        pipeline = clone(pipeline).set_params(**{f"{pipeline.steps[-1][0]}__n_jobs": 1})
+
+        search_conf = self.conf["search"]
+        trials = list(
+            ParameterSampler(
+                search_conf["param_distributions"],
+                n_iter=search_conf.get("max_trials", 10),
+                random_state=search_conf.get("seed"),
+            )
+        )
+        if search_conf.get("backend", "local") == "spark":
+            batch_size = search_conf.get("n_jobs", self.spark.sparkContext.defaultParallelism)
+        else:
+            batch_size = search_conf.get("n_jobs", 4)
+        timeout = search_conf.get("timeout_seconds")
+        self.logger.info(f"Searching hyperparameters over {len(trials)} trials in batches of {batch_size}")
+
+        start = time.time()
+        results: List[Dict[str, Any]] = []
+        while len(trials) > 0:
+            if timeout is not None and time.time() - start > timeout:
+                self.logger.info("Time budget of the hyperparameter search used up, stopping early")
+                break
+
+            batch, trials = trials[:batch_size], trials[batch_size:]
+            for result in self._evaluate_trials(pipeline, batch, data):
+                with mlflow.start_run(
+                    run_name=f"trial-{len(results)}", experiment_id=self.experiment_id, nested=True
+                ):
+                    mlflow.log_params(result["params"])
+                    mlflow.log_metric("r2", result["r2"])
+                    mlflow.log_metric("fit_time", result["fit_time"])
+                results.append(result)
+
+        mlflow.log_metric("search_trials", len(results))
+        if len(results) == 0:
+            self.logger.warn("No trial of the hyperparameter search finished, keeping the default parameters")
+            return {}
+
+        best_result = max(results, key=lambda result: result["r2"])
+        self.logger.info(f"Best hyperparameters {best_result['params']} with r2 {best_result['r2']}")
+        return best_result["params"]
+
+    @traced("train_grouped")
+    def _train_grouped(self) -> DataFrame:
+        """
+        Trains one pipeline per series on the executors. The table is partitioned by the series
+        key, so the driver only receives the per-series metrics. Aggregates of the metrics are
+        logged to MLflow and the per-series metrics are written to the metrics table, which is
+        required in this mode.
+        """
+        import mlflow
+
+        training_conf = self.conf.get("training", {})
+        series_key = training_conf.get("series_key", "series_id")
+        data = self._read_input(required_columns=[series_key])
+        schema = (
+            f"{series_key} {data.schema[series_key].dataType.simpleString()}, "
+            "n_rows long, r2 double, fit_time double"
+        )
+        self.logger.info(f"Training a model per {series_key} on the executors")
+        metrics = data.groupBy(series_key).applyInPandas(
+            partial(
+                train_group,
+                pipeline=self._get_pipeline(),
+                series_key=series_key,
+                target_column=self.TARGET_COLUMN,
+                seed=training_conf.get("seed"),
+            ),
+            schema=schema,
+        )
+
+        self._write_table(metrics, training_conf["metrics_table"], output_conf={})
+        metrics = self._publish(
+            training_conf["metrics_table"], self.spark.table(training_conf["metrics_table"])
+        )
+
+        summary = metrics.agg(
+            F.count("*").alias("n_series"),
+            F.mean("r2").alias("r2_mean"),
+            F.expr("percentile_approx(r2, 0.5)").alias("r2_median"),
+            F.min("r2").alias("r2_min"),
+            F.max("r2").alias("r2_max"),
+            F.sum("fit_time").alias("fit_time_total"),
+        ).collect()[0]
+        mlflow.log_metrics(
+            {key: float(value) for key, value in summary.asDict().items() if value is not None}
+        )
+        self.logger.info(f"Trained {summary['n_series']} models, mean r2: {summary['r2_mean']}")
+        return metrics
+
+    def _split_incremental(self) -> Tuple[DataFrame, DataFrame, List[str]]:
+        training_conf = self.conf.get("training", {})
+        test_fraction = training_conf.get("incremental", {}).get("test_fraction", 0.25)
+        data = self._read_input()
+        feature_columns = [column for column in data.columns if column != self.TARGET_COLUMN]
+        train, test = data.randomSplit([1 - test_fraction, test_fraction], seed=training_conf.get("seed"))
+        return train.persist(StorageLevel.MEMORY_AND_DISK), test, feature_columns
+
+    def _fit_sgd(self, train: DataFrame, feature_columns: List[str]) -> "Pipeline":
+        """
+        Fits a scaler and a linear model with partial_fit on the streamed batches. The scaler needs a pass
+        over the data before the first epoch of the model.
+        """
+        from sklearn.pipeline import Pipeline
+        from sklearn.linear_model import SGDRegressor
+        from sklearn.preprocessing import StandardScaler
+
+        from examplerepo.helperfunctions.out_of_core import batch_to_numpy
+
+        training_conf = self.conf.get("training", {})
+        scaler = StandardScaler()
+        for batch in self._to_arrow_batches(train):
+            scaler.partial_fit(batch_to_numpy(batch, feature_columns))
+
+        model = SGDRegressor(random_state=training_conf.get("seed"))
+        for epoch in range(training_conf.get("incremental", {}).get("epochs", 5)):
+            self.logger.info(f"Fitting epoch {epoch} of the linear model")
+            for batch in self._to_arrow_batches(train):
+                X = scaler.transform(batch_to_numpy(batch, feature_columns))
+                model.partial_fit(X, batch.column(self.TARGET_COLUMN).to_numpy(zero_copy_only=False))
+        return Pipeline([("scaler", scaler), ("sgd", model)])
+
+    def _fit_lightgbm(self, train: DataFrame, feature_columns: List[str]) -> Any:
+        """
+        Fits a LightGBM booster. The streamed batches are spilled to a memory-mapped file on local disk,
+        from which LightGBM constructs its binned dataset batch by batch; only the binned dataset and the
+        target are held in memory.
+        """
+        import lightgbm as lgb
+
+        from examplerepo.helperfunctions.out_of_core import ArrowSequence, spill_batches
+
+        incremental_conf = self.conf.get("training", {}).get("incremental", {})
+        params = {"objective": "regression", "verbosity": -1, **incremental_conf.get("params", {})}
+        spill_dir = Path(incremental_conf.get("spill_dir") or tempfile.mkdtemp(prefix="examplerepo_"))
+        with self.span("spill") as span:
+            batches = spill_batches(self._to_arrow_batches(train), spill_dir / "train.arrow")
+            span.rows = sum(batch.num_rows for batch in batches)
+        label = np.concatenate(
+            [batch.column(self.TARGET_COLUMN).to_numpy(zero_copy_only=False) for batch in batches]
+        )
+        dataset = lgb.Dataset(
+            ArrowSequence.from_batches(batches, feature_columns), label=label, params=params
+        )
+        return lgb.train(params, dataset, num_boost_round=incremental_conf.get("num_boost_round", 100))
+
+    def _score_incremental(self, model: Any, test: DataFrame, feature_columns: List[str]) -> float:
+        from examplerepo.helperfunctions.out_of_core import RunningR2, batch_to_numpy
+
+        r2 = RunningR2()
+        for batch in self._to_arrow_batches(test):
+            y_pred = model.predict(batch_to_numpy(batch, feature_columns))
+            r2.update(batch.column(self.TARGET_COLUMN).to_numpy(zero_copy_only=False), y_pred)
+        return r2.score()
+
+    @traced("train_incremental")
+    def _train_incremental(self) -> Any:
+        """
+        Trains on the input table without collecting it into a single pandas dataframe: the train and
+        test set are streamed to the driver as Arrow batches, one partition at a time. The sgd estimator
+        is fitted with partial_fit, the lightgbm estimator on a dataset constructed batch by batch.
+        """
+        import mlflow
+        import mlflow.sklearn
+        import mlflow.lightgbm
+
+        estimator = self.conf.get("training", {}).get("incremental", {}).get("estimator", "sgd")
+        train, test, feature_columns = self._split_incremental()
+        self.logger.info(f"Fitting {estimator} incrementally on the features {feature_columns}")
+        with self.span("fit"):
+            if estimator == "lightgbm":
+                model = self._fit_lightgbm(train, feature_columns)
+            else:
+                model = self._fit_sgd(train, feature_columns)
+        train.unpersist()
+
+        with self.span("predict"):
+            r2_result = self._score_incremental(model, test, feature_columns)
+        with self.span("log_mlflow"):
+            mlflow.log_metric("r2", r2_result)
+            if estimator == "lightgbm":
+                mlflow.lightgbm.log_model(model, "model")
+            else:
+                mlflow.sklearn.log_model(
+                    model, "model", serialization_format=mlflow.sklearn.SERIALIZATION_FORMAT_CLOUDPICKLE
+                )
+        self.logger.info(f"Trained {estimator} incrementally, r2: {r2_result}")
+        return model
+
     def _train_model(self) -> Any:
+        import mlflow
+        import mlflow.sklearn
+        from sklearn.metrics import r2_score
+        from sklearn.model_selection import train_test_split
+
+        if self.conf.get("training", {}).get("mode", "single") == "grouped":
+            with mlflow.start_run(experiment_id=self.experiment_id):
+                return self._train_grouped()
+        if self.conf.get("training", {}).get("mode", "single") == "incremental":
+            with mlflow.start_run(experiment_id=self.experiment_id):
+                return self._train_incremental()
+
         mlflow.sklearn.autolog()
         pipeline = self._get_pipeline()
         data = self._read_data()
-        X = data.drop(self.TARGET_COLUMN, axis=1)
+        X = get_features(data, [self.TARGET_COLUMN])
         y = data[self.TARGET_COLUMN]
         X_train, X_test, y_train, y_test = train_test_split(X, y)
-        pipeline.fit(X_train, y_train)
-        y_pred = pipeline.predict(X_test)
-        r2_result = r2_score(y_test, y_pred)
-        mlflow.log_metric("r2", r2_result)
+        with mlflow.start_run(experiment_id=self.experiment_id):
+            if self.conf.get("training", {}).get("mode", "single") == "search":
+                best_params = self._search_pipeline(pipeline, (X_train, X_test, y_train, y_test))
+                pipeline.set_params(**best_params)
+            with self.span("fit") as span:
+                span.rows = len(X_train.index)
+                pipeline.fit(X_train, y_train)
+            with self.span("predict") as span:
+                span.rows = len(X_test.index)
+                y_pred = pipeline.predict(X_test)
+            r2_result = r2_score(y_test, y_pred)
+            with self.span("log_mlflow"):
+                mlflow.log_metric("r2", r2_result)
+
+    def _log_profile(self, profile_dir: Path) -> None:
+        import mlflow
+        from mlflow.tracking import MlflowClient
+
+        run = mlflow.last_active_run()
+        if run is not None:
+            self.logger.info(f"Logging the profile reports to the MLflow run {run.info.run_id}")
+            MlflowClient().log_artifacts(run.info.run_id, str(profile_dir), artifact_path="profile")
 
     def launch(self) -> Any:
         self.logger.info("Launching sample ETL job")
-        mlflow.set_experiment(self.conf["experiment"])
-        self._train_model()
+        with self.span("launch"):
+            self._train_model()
         self.logger.info("Sample ETL job finished!")
 
 
 def entrypoint() -> Any:  # pragma: no cover
     task = SampleModelTask()
-    task.launch()
+    task.run()
 
 
 # if you're using spark_python_task, you'll need the __main__ block to start the code execution
@@ -0,0 +1,166 @@
+import datetime
+from typing import Any, Dict, List
+
+import pandas as pd
+
+from pyspark.sql import functions as F
+
+from examplerepo.common import Task, traced
+from examplerepo.config import NUMBER, TASK_SCHEMA, OUTPUT_SCHEMA, Field
+from examplerepo.testdata.create.googletrends import (
+    renormalise_data,
+    create_datefilter,
+    download_data_concurrently,
+)
+from examplerepo.helperfunctions.combine_pandas_dataframes import DataFrameAccumulator
+
+
+class SampleGoogleTrendsTask(Task):
+    """
+    Task that ingests Google Trends data into a Delta table. In incremental mode only the
+    dates after the last stored date of every keyword are downloaded, plus a small overlap
+    that is used to rescale the new data to the stored data. The result is merged into the
+    table on keyword and date.
+    """
+
+    # Function creating the Trends client, e.g. a stand-in for the API in tests
+    CLIENT_FACTORY: Any = None
+    CONFIG_SCHEMA: Dict[str, Field] = {
+        **TASK_SCHEMA,
+        "output": Field(dict, required=True, schema=OUTPUT_SCHEMA),
+        "keywords": Field(list, required=True),
+        "duration": Field(int),
+        "incremental": Field(bool),
+        "overlap_days": Field(int),
+        "min_window_days": Field(int),
+        "max_workers": Field(int),
+        "requests_per_second": Field(NUMBER),
+        "cache_mode": Field(str, choices=["use", "refresh", "bypass"]),
+    }
+
+    def _get_table_name(self) -> str:
+        db = self.conf["output"].get("database", "default")
+        table = self.conf["output"]["table"]
+        return f"{db}.{table}"
+
+    def _get_last_dates(self) -> Dict[str, datetime.date]:
+        table_name = self._get_table_name()
+        if not self.spark.catalog.tableExists(table_name):
+            return {}
+
+        last_dates = (
+            self.spark.table(table_name).groupBy("keyword").agg(F.max("date").alias("date")).collect()
+        )
+        return {row["keyword"]: datetime.date.fromisoformat(row["date"]) for row in last_dates}
+
+    def _get_startdates(self, keywords: List) -> Dict[str, Any]:
+        """
+        Determine the startdate of the download window per keyword. Keywords without stored
+        data (or all keywords when not incremental) get no startdate, i.e. the full duration.
+        Google Trends returns daily instead of weekly data for short windows, therefore the
+        window is at least min_window_days long.
+        """
+        if not self.conf.get("incremental", True):
+            return {keyword: None for keyword in keywords}
+
+        last_dates = self._get_last_dates()
+        overlap = datetime.timedelta(days=self.conf.get("overlap_days", 28))
+        min_window = datetime.timedelta(days=self.conf.get("min_window_days", 270))
+        today = datetime.date.today()
+
+        startdates: Dict[str, Any] = {}
+        for keyword in keywords:
+            startdate = None
+            if keyword in last_dates:
+                startdate = min(last_dates[keyword] - overlap, today - min_window)
+            startdates[keyword] = startdate
+        return startdates
+
+    @traced("download")
+    def _download_data(self) -> pd.DataFrame:
+        keywords = self.conf["keywords"]
+        duration = self.conf.get("duration", 48)
+        startdates = self._get_startdates(keywords)
+
+        # Download all keywords sharing the same window at once
+        windows: Dict[Any, List] = {}
+        for keyword, startdate in startdates.items():
+            windows.setdefault(startdate, []).append(keyword)
+
+        googletrends_data = DataFrameAccumulator()
+        for startdate, window_keywords in windows.items():
+            self.logger.info(f"Downloading {len(window_keywords)} keywords starting from {startdate}")
+            datefilter = create_datefilter(duration=duration, startdate=startdate)
+            googletrends_data.append(
+                download_data_concurrently(
+                    window_keywords,
+                    datefilter=datefilter,
+                    max_workers=self.conf.get("max_workers", 4),
+                    requests_per_second=self.conf.get("requests_per_second", 1.0),
+                    client_factory=self.CLIENT_FACTORY,
+                    cache_mode=self.conf.get("cache_mode", "use"),
+                )
+            )
+
+        return googletrends_data.finalize()
+
+    @traced("renormalise")
+    def _renormalise_data(self, googletrends_data: pd.DataFrame) -> pd.DataFrame:
+        table_name = self._get_table_name()
+        if not self.spark.catalog.tableExists(table_name):
+            return googletrends_data
+
+        reference = self.spark.table(table_name).where(F.col("date") >= googletrends_data["date"].min())
+        reference_data = self._to_pandas(reference.select("keyword", "date", "interest"))
+        return renormalise_data(googletrends_data, reference_data)
+
+    def _write_data(self) -> None:
+        from delta.tables import DeltaTable
+
+        table_name = self._get_table_name()
+        googletrends_data = self._download_data()
+        if googletrends_data is None:
+            self.logger.info("No Google Trends data downloaded")
+            return
+
+        googletrends_data = self._renormalise_data(googletrends_data)
+        updates = self._to_spark(googletrends_data)
+
+        if not self.spark.catalog.tableExists(table_name):
+            self.logger.info(f"Creating {table_name} with {len(googletrends_data.index)} rows")
+            self._write_table(updates, table_name)
+        else:
+            self.logger.info(f"Merging {len(googletrends_data.index)} rows into {table_name}")
+            with self.span("write_delta") as span:
+                (
+                    DeltaTable.forName(self.spark, table_name)
+                    .alias("target")
+                    .merge(
+                        updates.alias("updates"),
+                        "target.keyword = updates.keyword AND target.date = updates.date",
+                    )
+                    .whenMatchedUpdateAll()
+                    .whenNotMatchedInsertAll()
+                    .execute()
+                )
+                write_metrics = self._report_write(table_name)
+                span.rows = write_metrics["rows"]
+                span.bytes = write_metrics["bytes"]
+            self._optimize_table(table_name, self.conf["output"])
+        self.logger.info("Dataset successfully written")
+
+    def launch(self) -> None:
+        self.logger.info("Launching Google Trends ingestion job")
+        with self.span("launch"):
+            self._write_data()
+        self.logger.info("Google Trends ingestion job finished!")
+
+
+def entrypoint() -> None:  # pragma: no cover
+    task = SampleGoogleTrendsTask()
+    task.run()
+
+
+# if you're using spark_python_task, you'll need the __main__ block to start the code execution
+if __name__ == "__main__":
+    entrypoint()
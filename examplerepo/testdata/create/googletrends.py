@@ -1,11 +1,23 @@
+import os
+import time
 import datetime
+import threading
 from typing import Any, List
+from concurrent.futures import ThreadPoolExecutor
 
+import numpy as np
 import pandas as pd
 from pytrends.request import TrendReq
 from dateutil.relativedelta import relativedelta
 
-from examplerepo.helperfunctions.combine_pandas_dataframes import combine_pandas_dataframes
+from examplerepo.helperfunctions.token_bucket import TokenBucket
+from examplerepo.helperfunctions.parquet_cache import ParquetCache
+from examplerepo.helperfunctions.combine_pandas_dataframes import DataFrameAccumulator
+
+# Default location of the on-disk cache for Google Trends responses
+CACHE_DIRECTORY = os.environ.get(
+    "GOOGLETRENDS_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "examplerepo", "googletrends")
+)
 
 
 def reformat_date(date: Any, dateformat: str) -> datetime.date:
@@ -65,7 +77,9 @@ def determine_startdate(enddate: Any, duration: int) -> datetime.date:
     return startdate
 
 
-def create_datefilter(duration: int, enddate: Any = None, dateformat: str = "%Y-%m-%d") -> str:
+def create_datefilter(
+    duration: int, enddate: Any = None, dateformat: str = "%Y-%m-%d", startdate: Any = None
+) -> str:
     """
     Function to use the duration and the enddate to create a
     googletrends timefilter.
@@ -75,6 +89,8 @@ def create_datefilter(duration: int, enddate: Any = None, dateformat: str = "%Y-
     duration: duration of the googletrends timefilter.
     enddate: enddate of the googletrends timefilter.
     dateformat: format in which the enddatefield is captured.
+    startdate: startdate of the googletrends timefilter. When supplied it
+      is used instead of the duration, e.g. for incremental downloads.
 
     """
 
@@ -85,7 +101,10 @@ def create_datefilter(duration: int, enddate: Any = None, dateformat: str = "%Y-
     print("End Date time filter Google Trends", enddate)
 
     # Use enddate and filter duration to determine teh startdate
-    startdate = determine_startdate(enddate, duration)
+    if startdate is None:
+        startdate = determine_startdate(enddate, duration)
+    elif isinstance(startdate, str):
+        startdate = reformat_date(startdate, dateformat)
     datefilter = str(startdate) + " " + str(enddate)
     print("date filter for Google Trends: ", datefilter)
     return datefilter
@@ -125,6 +144,7 @@ def download_data(
     timeout: tuple,
     retries: int,
     backoff_factor: float,
+    pytrends: Any = None,
 ) -> pd.DataFrame:
     """
     Function to download the googletrends data.
@@ -142,11 +162,15 @@ def download_data(
     timeout: timeout, in case the server is not responding in a timely manner.
     retries: number of retries total/connect/read all represented by one scalar.
     backoff_factor: backoff factor to apply between attempts after the second try.
+    pytrends: existing TrendReq client (or a stand-in) to reuse. A new client is created when empty.
 
     """
 
     # Configure quasi-API
-    pytrends = TrendReq(hl=language, tz=tz, timeout=timeout, retries=retries, backoff_factor=backoff_factor)
+    if pytrends is None:
+        pytrends = TrendReq(
+            hl=language, tz=tz, timeout=timeout, retries=retries, backoff_factor=backoff_factor
+        )
 
     # Set the right configuration for request query Google trends.
     # Where needed make sure the request is a global one.
@@ -163,6 +187,166 @@ def download_data(
     return googletrendsresults_load
 
 
+def get_default_cache() -> ParquetCache:
+    """
+    Function to open the default on-disk cache for Google Trends responses. The location
+    can be set with the GOOGLETRENDS_CACHE_DIR environment variable.
+    """
+
+    return ParquetCache(CACHE_DIRECTORY)
+
+
+def is_historical_datefilter(datefilter: str) -> bool:
+    """
+    Function to check whether a googletrends timefilter ends before today. The data of
+    such a timefilter does not change anymore.
+
+    Parameters:
+
+    datefilter: filter that indicates the timeframe for the google trends results
+
+    """
+
+    try:
+        enddate = reformat_date(datefilter.split(" ")[-1], "%Y-%m-%d")
+    except ValueError:
+        return False
+
+    return enddate < datetime.date.today()
+
+
+def create_cache_key(keywords: List, datefilter: str, countrycode: str, searchcategory: int, tz: int) -> str:
+    """
+    Function to create the cache key of a googletrends request.
+
+    Parameters:
+
+    keywords: List of keywords for which the google trends
+      data needs to be downloaded
+    datefilter: filter that indicates the timeframe
+      for the google trends results
+    countrycode: Two letter country abbreviation
+    searchcategory: Category to narrow results
+    tz: Timezone Offset (in minutes).
+
+    """
+
+    return ParquetCache.create_key(
+        keywords=keywords, datefilter=datefilter, geo=countrycode, category=searchcategory, tz=tz
+    )
+
+
+def get_cached_data(
+    cache: ParquetCache, keywords: List, datefilter: str, countrycode: str, searchcategory: int, tz: int
+) -> Any:
+    """
+    Function to read a googletrends response from the cache. Returns None when the response
+    is not cached or has expired. Responses of historical timefilters never expire.
+
+    Parameters:
+
+    cache: cache containing the googletrends responses.
+    keywords: List of keywords for which the google trends
+      data needs to be downloaded
+    datefilter: filter that indicates the timeframe
+      for the google trends results
+    countrycode: Two letter country abbreviation
+    searchcategory: Category to narrow results
+    tz: Timezone Offset (in minutes).
+
+    """
+
+    cache_key = create_cache_key(keywords, datefilter, countrycode, searchcategory, tz)
+    return cache.get(cache_key, expires=not is_historical_datefilter(datefilter))
+
+
+def renormalise_data(googletrends_data: pd.DataFrame, reference_data: pd.DataFrame) -> pd.DataFrame:
+    """
+    Function to rescale newly downloaded long-format googletrends data to the scale of
+    previously stored data. Google Trends normalises the interest of every request to its
+    own timeframe, so the interest is rescaled per keyword with the ratio of the total
+    interest on the overlapping dates.
+
+    Parameters:
+
+    googletrends_data: newly downloaded data in long format.
+    reference_data: previously stored data in long format, covering (part of) the same dates.
+
+    """
+
+    overlap = googletrends_data.merge(
+        reference_data[["keyword", "date", "interest"]], on=["keyword", "date"], suffixes=("", "_reference")
+    )
+    totals = overlap.groupby("keyword")[["interest", "interest_reference"]].sum()
+    factors = (totals["interest_reference"] / totals["interest"]).where(totals["interest"] > 0)
+
+    googletrends_data = googletrends_data.copy()
+    factor = googletrends_data["keyword"].map(factors).fillna(1.0)
+    googletrends_data["interest"] = (googletrends_data["interest"] * factor).round().astype("int64")
+
+    return googletrends_data
+
+
+def reshape_data_columnar(
+    googletrendsresults_load: pd.DataFrame,
+    keywords: List,
+    date_format: str = "string",
+    categorical_keyword: bool = False,
+) -> pd.DataFrame:
+    """
+    Function to reshape the downloaded googletrends data into the long format directly from the
+    underlying numpy arrays, without copying the wide dataframe first. The dates are converted
+    once per date instead of once per row. The rows are in the same order as with pd.melt:
+    all dates of the first keyword, followed by all dates of the second keyword etc.
+
+    Parameters:
+
+    googletrendsresults_load: dataframe containing the data
+       in the original format, indexed by date
+    keywords: keyword columns that need to be reshaped
+    date_format: "string" for ISO date strings (as reshape_data), "category" for categorical
+       ISO date strings or "datetime" for datetime64 values truncated to the day
+    categorical_keyword: boolean to indicate whether the keyword is stored as a category
+
+    """
+
+    n_dates = len(googletrendsresults_load.index)
+    n_keywords = len(keywords)
+
+    # Convert the dates once and repeat them for every keyword
+    dates = googletrendsresults_load.index
+    if date_format == "datetime":
+        date = np.tile(pd.DatetimeIndex(dates).normalize().to_numpy(), n_keywords)
+    else:
+        date_strings = dates.astype(str).str[:10].to_numpy(dtype=object)
+        if date_format == "category":
+            date_categories = pd.Categorical(date_strings)
+            date = pd.Categorical.from_codes(
+                np.tile(date_categories.codes, n_keywords), dtype=date_categories.dtype
+            )
+        else:
+            date = np.tile(date_strings, n_keywords)
+
+    keyword_codes = np.repeat(np.arange(n_keywords), n_dates)
+    if categorical_keyword:
+        keyword = pd.Categorical.from_codes(keyword_codes, categories=keywords)
+    else:
+        keyword = np.asarray(keywords, dtype=object)[keyword_codes]
+
+    googletrends_data_final = pd.DataFrame(
+        {
+            "date": date,
+            "isPartial": np.tile(googletrendsresults_load["isPartial"].to_numpy(), n_keywords),
+            "keyword": keyword,
+            # Column-major order puts all dates of a keyword next to each other
+            "interest": googletrendsresults_load[keywords].to_numpy().ravel(order="F"),
+        },
+        copy=False,
+    )
+
+    return googletrends_data_final
+
+
 def reshape_data(googletrendsresults_load: pd.DataFrame, longformat: bool, keywords: List) -> pd.DataFrame:
     """
     Function to reshape the downloaded googletrends data.
@@ -176,6 +360,10 @@ def reshape_data(googletrendsresults_load: pd.DataFrame, longformat: bool, keywo
 
     """
 
+    # Use the columnar reshape when all columns of the original format are available.
+    if longformat is True and set(keywords) | {"isPartial"} <= set(googletrendsresults_load.columns):
+        return reshape_data_columnar(googletrendsresults_load, keywords=keywords)
+
     googletrends_data_final = None
 
     # Reset the index of dataframe
@@ -214,6 +402,9 @@ def download_reshape_data(
     timeout: tuple = (10, 25),
     retries: int = 2,
     backoff_factor: float = 0.1,
+    pytrends: Any = None,
+    cache: Any = None,
+    cache_mode: str = "use",
 ) -> pd.DataFrame:
     """
     Function to download and reshape the googletrends data.
@@ -233,16 +424,46 @@ def download_reshape_data(
     timeout: timeout, in case the server is not responding in a timely manner.
     retries: number of retries total/connect/read all represented by one scalar.
     backoff_factor: backoff factor to apply between attempts after the second try.
+    pytrends: existing TrendReq client (or a stand-in) to reuse. A new client is created when empty.
+    cache: cache for the googletrends responses. The default cache is used when empty.
+    cache_mode: "use" reads and writes the cache, "refresh" downloads the data again and
+      overwrites the cache and "bypass" does not use the cache at all.
 
     """
 
     # Send error message if the list with keywords is not supplied
     check_keywords(keywords)
 
-    print(datetime.datetime.now(), " - Start downloading Google Trends API Output")
-    googletrendsresults_load = download_data(
-        keywords, datefilter, countrycode, language, searchcategory, tz, timeout, retries, backoff_factor
-    )
+    if cache_mode != "bypass" and cache is None:
+        cache = get_default_cache()
+
+    googletrendsresults_load = None
+
+    if cache_mode == "use":
+        googletrendsresults_load = get_cached_data(
+            cache, keywords, datefilter, countrycode, searchcategory, tz
+        )
+
+    if googletrendsresults_load is None:
+        print(datetime.datetime.now(), " - Start downloading Google Trends API Output")
+        googletrendsresults_load = download_data(
+            keywords,
+            datefilter,
+            countrycode,
+            language,
+            searchcategory,
+            tz,
+            timeout,
+            retries,
+            backoff_factor,
+            pytrends=pytrends,
+        )
+
+        # Store the response before the reshape modifies it
+        if cache_mode != "bypass" and googletrendsresults_load is not None:
+            if len(googletrendsresults_load.index) > 0:
+                cache_key = create_cache_key(keywords, datefilter, countrycode, searchcategory, tz)
+                cache.put(cache_key, googletrendsresults_load)
 
     googletrends_data_final = None
 
@@ -256,7 +477,9 @@ def download_reshape_data(
     return googletrends_data_final
 
 
-def download_data_keyword_by_keyword(keywords: List) -> pd.DataFrame:
+def download_data_keyword_by_keyword(
+    keywords: List, cache: Any = None, cache_mode: str = "use"
+) -> pd.DataFrame:
     """
     Function to download and reshape the googletrends data. Download happens
     a single keyword at a time, to enable downloading more than 5 keywords.
@@ -265,20 +488,139 @@ def download_data_keyword_by_keyword(keywords: List) -> pd.DataFrame:
 
     keywords: List of keywords for which the google trends
       data needs to be downloaded
+    cache: cache for the googletrends responses. The default cache is used when empty.
+    cache_mode: "use", "refresh" or "bypass" the cache, see download_reshape_data.
 
     """
 
     duration = 48
     datefilter = create_datefilter(duration=duration, enddate="2021-12-31")
 
-    googletrends_data_final = None
+    googletrends_data = DataFrameAccumulator()
 
     for keyword in keywords:
-        googletrends_data_delta = download_reshape_data(datefilter, keywords=[keyword])
-        googletrends_data_final = combine_pandas_dataframes(
-            dataset_overall=googletrends_data_final, dataset_delta=googletrends_data_delta
+        googletrends_data.append(
+            download_reshape_data(datefilter, keywords=[keyword], cache=cache, cache_mode=cache_mode)
         )
 
+    googletrends_data_final = googletrends_data.finalize()
+
+    if googletrends_data_final is not None:
+        googletrends_data_final = googletrends_data_final.sort_values(by=["keyword", "date"])
+
+    return googletrends_data_final
+
+
+def download_data_concurrently(
+    keywords: List,
+    datefilter: Any = None,
+    max_workers: int = 4,
+    requests_per_second: float = 1.0,
+    max_attempts: int = 3,
+    retry_backoff: float = 2.0,
+    client_factory: Any = None,
+    countrycode: str = "NL",
+    language: str = "en-US",
+    searchcategory: int = 71,
+    tz: int = 360,
+    timeout: tuple = (10, 25),
+    retries: int = 2,
+    backoff_factor: float = 0.1,
+    cache: Any = None,
+    cache_mode: str = "use",
+) -> pd.DataFrame:
+    """
+    Function to download and reshape the googletrends data for many keywords at once.
+    Keywords are downloaded a single keyword at a time by a bounded pool of worker threads.
+    All workers share a token bucket that limits the request rate, every worker reuses its
+    own TrendReq client and failed keywords are retried with an exponential backoff.
+    The output has the same format as download_data_keyword_by_keyword.
+
+    Parameters:
+
+    keywords: List of keywords for which the google trends
+      data needs to be downloaded
+    datefilter: filter that indicates the timeframe for the google trends results.
+      Defaults to the timeframe of download_data_keyword_by_keyword.
+    max_workers: maximum number of keywords downloaded at the same time.
+    requests_per_second: maximum number of requests per second over all workers.
+    max_attempts: number of attempts per keyword before the download fails.
+    retry_backoff: wait in seconds before the second attempt, doubled for every next attempt.
+    client_factory: function without arguments that creates the client used by a worker,
+      e.g. a stand-in for the API in tests. Defaults to TrendReq.
+    countrycode: Two letter country abbreviation
+    language:  host language for accessing Google Trends
+    searchcategory: Category to narrow results
+    tz: Timezone Offset (in minutes).
+    timeout: timeout, in case the server is not responding in a timely manner.
+    retries: number of retries total/connect/read all represented by one scalar.
+    backoff_factor: backoff factor to apply between attempts after the second try.
+    cache: cache for the googletrends responses. The default cache is used when empty.
+    cache_mode: "use", "refresh" or "bypass" the cache, see download_reshape_data.
+
+    """
+
+    # Send error message if the list with keywords is not supplied
+    check_keywords(keywords)
+
+    if cache_mode != "bypass" and cache is None:
+        cache = get_default_cache()
+
+    if datefilter is None:
+        datefilter = create_datefilter(duration=48, enddate="2021-12-31")
+
+    def create_client() -> Any:
+        if client_factory is not None:
+            return client_factory()
+        return TrendReq(hl=language, tz=tz, timeout=timeout, retries=retries, backoff_factor=backoff_factor)
+
+    bucket = TokenBucket(rate=requests_per_second)
+    clients = threading.local()
+
+    def download_keyword(keyword: str) -> pd.DataFrame:
+        # Serve cached keywords without creating a client or waiting for the rate limiter
+        if cache_mode == "use":
+            googletrendsresults_load = get_cached_data(
+                cache, [keyword], datefilter, countrycode, searchcategory, tz
+            )
+            if googletrendsresults_load is not None:
+                return reshape_data(googletrendsresults_load, longformat=True, keywords=[keyword])
+
+        attempt = 0
+        while True:
+            if getattr(clients, "pytrends", None) is None:
+                clients.pytrends = create_client()
+            bucket.acquire()
+            try:
+                return download_reshape_data(
+                    datefilter,
+                    keywords=[keyword],
+                    countrycode=countrycode,
+                    searchcategory=searchcategory,
+                    tz=tz,
+                    pytrends=clients.pytrends,
+                    cache=cache,
+                    cache_mode="refresh" if cache_mode == "use" else cache_mode,
+                )
+            except Exception as error:
+                attempt += 1
+                if attempt == max_attempts:
+                    raise
+                print(f"Download of keyword {keyword} failed ({error}), retrying")
+                # Start the next attempt with a fresh client (and session)
+                clients.pytrends = None
+                time.sleep(retry_backoff * 2 ** (attempt - 1))
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        googletrends_data_deltas = list(executor.map(download_keyword, keywords))
+
+    googletrends_data = DataFrameAccumulator()
+
+    for googletrends_data_delta in googletrends_data_deltas:
+        googletrends_data.append(googletrends_data_delta)
+
+    googletrends_data_final = googletrends_data.finalize()
+
     if googletrends_data_final is not None:
         googletrends_data_final = googletrends_data_final.sort_values(by=["keyword", "date"])
 
@@ -1,9 +1,13 @@
-import random
-from typing import Any, List
+from typing import Any, List, Iterator
 
 import numpy as np
 import pandas as pd
-from statsmodels.tsa.arima_process import arma_generate_sample
+
+# Value columns of a simulated timeseries
+TIMESERIES_COLUMNS = ["sales_total", "sales_arma", "promotion_timing"]
+
+# Number of time units simulated at once, bounds the memory used by intermediate float64 values
+SIMULATION_CHUNKSIZE = 2**20
 
 
 def simulate_seasonal_flow(timerange: int, frequencies: List, amplitudes: List) -> List:
@@ -40,7 +44,7 @@ def simulate_seasonal_flow(timerange: int, frequencies: List, amplitudes: List)
     return seasonality
 
 
-def random_integer(frequency: float) -> float:
+def random_integer(frequency: float, rng: Any = None) -> float:
     """
     This function creates a random integer with either the value 0 or 1.
     With the frequency parameter you can set can control the occurrence of the 1 value.
@@ -48,10 +52,14 @@ def random_integer(frequency: float) -> float:
     Parameters:
 
     frequency: the occurrence of the 1 value.
+    rng: numpy random generator used for the draw, a freshly seeded generator when empty.
 
     """
 
-    probability = random.uniform(0, 1)
+    if rng is None:
+        rng = np.random.default_rng()
+
+    probability = rng.uniform(0, 1)
 
     integer = 0
 
@@ -61,8 +69,31 @@ def random_integer(frequency: float) -> float:
     return float(integer)
 
 
+def simulate_promotion_timing(size: int, frequency: float, rng: Any = None) -> np.ndarray:
+    """
+    This function simulates the promotion dummies of a number of time units in a single draw.
+    A time unit has a promotion (value 1) with probability frequency and none (value 0) otherwise.
+
+    Parameters:
+
+    size: number of time units.
+    frequency: the occurrence of the 1 value.
+    rng: numpy random generator used for the draws, a freshly seeded generator when empty.
+    """
+
+    if rng is None:
+        rng = np.random.default_rng()
+
+    return (rng.uniform(0, 1, size) <= frequency).astype(np.float64)
+
+
 def simulate_promotion(
-    timerange: int, fullyear: int, sales_total: List, promotion_uplift_perc: float, promotion_frequency: int
+    timerange: int,
+    fullyear: int,
+    sales_total: List,
+    promotion_uplift_perc: float,
+    promotion_frequency: int,
+    rng: Any = None,
 ) -> tuple:
     """
     This function simulates a promotion dummy. This dummy has either the value or 1
@@ -76,10 +107,11 @@ def simulate_promotion(
     y_total: value of the normal sales for each time unit.
     promotion_uplift: uplift for the time units in which there is a promotion
     promotion_frequency: the frequency at which there is a promotion
+    rng: numpy random generator used for the promotion draws.
     """
 
     # Simulate list with indication for occurence of promotion
-    promotion_timing = [random_integer(promotion_frequency / fullyear) for i in range(0, timerange)]
+    promotion_timing = simulate_promotion_timing(timerange, promotion_frequency / fullyear, rng=rng).tolist()
 
     # Create list with promotion uplift when a promotion takes place
     promotion_uplift_abs = [value * promotion_uplift_perc + 1 for value in promotion_timing]
@@ -92,10 +124,12 @@ def simulate_promotion(
 
 
 def simulate_arma(
-    timerange: int, arparams: np.array, maparams: np.array, scale: float, seed: Any = None
-) -> List:
+    timerange: int, arparams: np.array, maparams: np.array, scale: float, seed: Any = None, rng: Any = None
+) -> np.ndarray:
     """
-    This function simulates an arma effects within the simulated timeseries.
+    This function simulates an arma effects within the simulated timeseries. The process is
+    the same as statsmodels' arma_generate_sample and gives identical values for the same
+    random generator.
 
     Parameters:
 
@@ -103,22 +137,147 @@ def simulate_arma(
     arparams: parameters for the autocorrelations.
     maparams: parameters for the moving averages.
     scale: standard deviation of the white nois error term.
+    seed: fixed seed for the white noise, only used when no rng is given.
+    rng: numpy random generator used for the white noise.
     """
 
-    # Set seed
-    if seed is not None:
-        np.random.seed(seed)
-        print("Seed: ", seed)
+    if rng is None:
+        rng = np.random.default_rng(seed)
+
+    # Simulate ARMA process and round values to 4 digits
+    noise = rng.standard_normal(size=(1, timerange))
+    z_arma = simulate_arma_batch(
+        timerange=timerange,
+        arparams=_broadcast_vector_parameter(arparams, 1),
+        maparams=_broadcast_vector_parameter(maparams, 1),
+        scale=_broadcast_scalar_parameter(scale, 1),
+        noise=noise,
+    )
+
+    return z_arma[0]
 
-    # Simulate ARMA process
-    ar = np.r_[1, -arparams]  # add zero-lag and negate
-    ma = np.r_[1, maparams]  # add zero-lag
-    z_arma = arma_generate_sample(ar, ma, timerange, scale=scale)
 
-    # Round values arma process to 4 digits
-    z_arma = [round(datapoint, 4) for datapoint in z_arma]
+def _timeseries_generators(seed: Any, series_id: int = 0) -> tuple:
+    """
+    This function creates the independent random generators of a single series: one for the
+    white noise of the arma process and one for the promotion draws. Both are child streams of
+    the stream of the series, which is the child of the seed with the series id as spawn key,
+    so the outcome does not depend on the order in which they are consumed and a single series
+    is simulated identically to series 0 of a batch.
+
+    Parameters:
 
-    return z_arma
+    seed: fixed seed for the random sampling elements.
+    series_id: identifier of the series.
+    """
+
+    entropy = np.random.SeedSequence(seed).entropy
+    series_sequence = np.random.SeedSequence(entropy, spawn_key=(int(series_id),))
+    arma_sequence, promotion_sequence = series_sequence.spawn(2)
+    return (np.random.default_rng(arma_sequence), np.random.default_rng(promotion_sequence))
+
+
+def _simulate_timeseries_arrays(
+    timerange: int,
+    fullyear: int,
+    frequencies: List,
+    amplitudes: List,
+    arparams: np.array,
+    maparams: np.array,
+    scale: float,
+    promotion: bool,
+    promotion_uplift: Any,
+    promotion_frequency: Any,
+    seed: Any,
+    chunksize: int,
+) -> Iterator[tuple]:
+    """
+    This function simulates a sales timeseries in chunks of at most chunksize time units and
+    yields tuples (offset, sales_total, sales_arma, promotion_timing) with the position of the
+    chunk in the thinned timeseries. The state of the arma filter and the last full year of sales
+    are carried over between the chunks, so the result does not depend on the chunksize.
+    See simulate_timeseries for the other parameters.
+    """
+
+    # scipy is only imported when the arma process is simulated
+    from scipy.signal import lfilter
+
+    # Take two full years as a period for thinning the sampled data.
+    thinning = fullyear * 2
+    simulationrange = timerange + thinning
+
+    # Derive the random streams of the arma effects and the promotions from the seed
+    (arma_rng, promotion_rng) = _timeseries_generators(seed)
+
+    # State of the arma filter, the filter is the same as in arma_generate_sample
+    ar = np.r_[1, -arparams]
+    ma = np.r_[1, maparams]
+    arma_state = np.zeros(max(len(ar), len(ma)) - 1)
+
+    # The sales of the last full year, indexed by the position within the year
+    sales_lag = np.array(
+        simulate_seasonal_flow(timerange=fullyear, frequencies=frequencies, amplitudes=amplitudes)
+    )
+
+    for start in range(0, simulationrange, chunksize):
+        end = min(start + chunksize, simulationrange)
+
+        # Simulate the arma effects and round values to 4 digits
+        eta = scale * arma_rng.standard_normal(size=end - start)
+        sales_arma, arma_state = lfilter(ma, ar, eta, zi=arma_state)
+        sales_arma = sales_arma.round(4)
+
+        # Create the sales timeseries: y_t = y_(t - fullyear) + arma_t, computed as a cumulative
+        # sum over the years for every position within the year, starting from the last year.
+        # The first year is the seasonal flow itself, so it gets no arma increment.
+        chunk_start = fullyear + start % fullyear
+        chunk_end = chunk_start + end - start
+        first_year_end = chunk_start + max(fullyear - start, 0)
+        n_years = -(-chunk_end // fullyear)
+        increments = np.zeros(n_years * fullyear)
+        increments[:fullyear] = sales_lag
+        increments[chunk_start:chunk_end] = sales_arma
+        increments[chunk_start:first_year_end] = 0
+        sales_years = increments.reshape(n_years, fullyear).cumsum(axis=0)
+        sales_lag = sales_years[-1].copy()
+        sales_total = sales_years.ravel()[chunk_start:chunk_end]
+
+        # Add the promotional effect
+        promotion_timing = np.zeros(end - start)
+        if promotion is True:
+            promotion_timing = simulate_promotion_timing(
+                end - start, promotion_frequency / fullyear, rng=promotion_rng
+            )
+            sales_total *= promotion_timing * promotion_uplift + 1
+
+        # Use the thinning for the dataset
+        if end <= thinning:
+            continue
+        keep = slice(max(thinning - start, 0), None)
+        yield (max(start - thinning, 0), sales_total[keep], sales_arma[keep], promotion_timing[keep])
+
+
+def _timeseries_output(values: np.ndarray, first_time: int, output: str) -> Any:
+    """
+    This function wraps the simulated values of a single series into the requested output
+    without copying them.
+
+    Parameters:
+
+    values: float32 array of shape (3, n) with the sales_total, sales_arma and promotion_timing.
+    first_time: time of the first value.
+    output: "pandas" for a dataframe indexed by time, "arrow" for an Arrow table with a time column.
+    """
+
+    time = pd.RangeIndex(first_time, first_time + values.shape[1], name="time")
+    if output == "arrow":
+        import pyarrow as pa
+
+        columns = {"time": pa.array(time.to_numpy(dtype=np.int64))}
+        columns.update({column: pa.array(values[i]) for i, column in enumerate(TIMESERIES_COLUMNS)})
+        return pa.table(columns)
+
+    return pd.DataFrame(values.T, columns=TIMESERIES_COLUMNS, index=time, copy=False)
 
 
 def simulate_timeseries(
@@ -133,10 +292,12 @@ def simulate_timeseries(
     promotion_uplift: Any = None,
     promotion_frequency: Any = None,
     seed: Any = None,
-) -> pd.DataFrame:
+    output: str = "pandas",
+) -> Any:
     """
     This function simulates a sales timeseries with the possibility of
-    seasonality and arma effects.
+    seasonality and arma effects. The values are written into preallocated float32 arrays,
+    while the intermediate float64 values only exist for a single chunk.
 
     Parameters:
 
@@ -153,65 +314,368 @@ def simulate_timeseries(
     promotion_frequency: frequency at which the promotions occur.
     seed: fixed seed for the random sampling elements.
     Helps ensuring the simulation gives the same outcome for each run.
+    output: "pandas" for a dataframe indexed by time, "arrow" for an Arrow table.
+    """
+
+    values = np.empty((len(TIMESERIES_COLUMNS), timerange), dtype=np.float32)
+    for offset, *arrays in _simulate_timeseries_arrays(
+        timerange=timerange,
+        fullyear=fullyear,
+        frequencies=frequencies,
+        amplitudes=amplitudes,
+        arparams=arparams,
+        maparams=maparams,
+        scale=scale,
+        promotion=promotion,
+        promotion_uplift=promotion_uplift,
+        promotion_frequency=promotion_frequency,
+        seed=seed,
+        chunksize=SIMULATION_CHUNKSIZE,
+    ):
+        end = offset + len(arrays[0])
+        for i, array in enumerate(arrays):
+            values[i, offset:end] = array
+
+    return _timeseries_output(values, first_time=1, output=output)
+
+
+def simulate_timeseries_chunks(
+    timerange: int,
+    fullyear: int,
+    frequencies: List,
+    amplitudes: List,
+    arparams: np.array,
+    maparams: np.array,
+    scale: float,
+    promotion: bool = False,
+    promotion_uplift: Any = None,
+    promotion_frequency: Any = None,
+    seed: Any = None,
+    chunksize: int = 100000,
+    output: str = "pandas",
+) -> Iterator[Any]:
+    """
+    This function simulates the same sales timeseries as simulate_timeseries, but yields it in
+    dataframes of at most chunksize time units. The state of the arma filter and the last full
+    year of sales are carried over between the chunks, so the memory use does not depend on the
+    timerange and the concatenated chunks are identical to the output of simulate_timeseries.
+
+    Parameters:
+
+    timerange: total timespan for which the timeseries needs to be created
+    fullyear: Number of time units in a single year.
+    frequencies: Frequencies for the different foerier terms.
+    amplitudes: Amplitudes for the different foerier terms.
+    arparams: parameters for the autocorrelations.
+    maparams: parameters for the moving averages.
+    scale: standard deviation of the white nois error term.
+    promotion: boolean that indictes whether promotion effects need to be modeled as well.
+    promotion_uplift: size of the promotional uplift.
+    promotion_frequency: frequency at which the promotions occur.
+    seed: fixed seed for the random sampling elements.
+    chunksize: maximum number of time units per chunk.
+    output: "pandas" for dataframes indexed by time, "arrow" for Arrow tables.
+    """
+
+    for offset, *arrays in _simulate_timeseries_arrays(
+        timerange=timerange,
+        fullyear=fullyear,
+        frequencies=frequencies,
+        amplitudes=amplitudes,
+        arparams=arparams,
+        maparams=maparams,
+        scale=scale,
+        promotion=promotion,
+        promotion_uplift=promotion_uplift,
+        promotion_frequency=promotion_frequency,
+        seed=seed,
+        chunksize=chunksize,
+    ):
+        values = np.empty((len(TIMESERIES_COLUMNS), len(arrays[0])), dtype=np.float32)
+        for i, array in enumerate(arrays):
+            values[i] = array
+
+        yield _timeseries_output(values, first_time=offset + 1, output=output)
+
+
+def _broadcast_scalar_parameter(value: Any, n_series: int) -> np.ndarray:
     """
+    This function broadcasts a scalar parameter to an array with one value per series.
+
+    Parameters:
+
+    value: either a single value shared by all series or a sequence with one value per series.
+    n_series: number of series in the batch.
+    """
+
+    value = np.asarray(value, dtype=np.float64)
+    return np.broadcast_to(value, (n_series,))
+
+
+def _broadcast_vector_parameter(value: Any, n_series: int) -> np.ndarray:
+    """
+    This function broadcasts a vector parameter (e.g. the arparams) to a 2-D array
+    with one row per series.
+
+    Parameters:
+
+    value: either a 1-D sequence shared by all series or a 2-D array with one row per series.
+    n_series: number of series in the batch.
+    """
+
+    value = np.asarray(value, dtype=np.float64)
+    if value.ndim < 2:
+        value = value.reshape(1, -1)
+    return np.broadcast_to(value, (n_series, value.shape[1]))
+
+
+def simulate_seasonal_flow_batch(fullyear: int, frequencies: Any, amplitudes: Any) -> np.ndarray:
+    """
+    This function simulates the seasonal flow for a batch of series at once using a summation
+    of fourier terms. It returns a 2-D array with one row per series.
+
+    Parameters:
+
+    fullyear: Number of time units in a single year.
+    frequencies: Frequencies for the different fourier terms, shape (n_series, n_terms).
+    amplitudes: Amplitudes for the different fourier terms, shape (n_series, n_terms).
+    """
+
+    time = np.arange(0, 1, 1 / fullyear)
+
+    # Create the first fourier term and summate the rest of the terms
+    seasonality = amplitudes[:, :1] * np.sin(2 * np.pi * frequencies[:, :1] * time)
+    for i in range(1, frequencies.shape[1]):
+        seasonality += amplitudes[:, [i]] * np.sin(2 * np.pi * frequencies[:, [i]] * time)
+        seasonality = seasonality.round(4)
+
+    # Adjust minimum level of seasonality to 0 and round value to 4 digits
+    seasonality = seasonality - seasonality.min(axis=1, keepdims=True)
+    seasonality = seasonality.round(4)
+
+    return seasonality
+
+
+def simulate_arma_batch(
+    timerange: int, arparams: np.ndarray, maparams: np.ndarray, scale: np.ndarray, noise: np.ndarray
+) -> np.ndarray:
+    """
+    This function simulates the arma effects for a batch of series at once by filtering the
+    white noise with scipy's lfilter, like statsmodels' arma_generate_sample. Series that share
+    their arma parameters are filtered together in a single call.
+
+    Parameters:
+
+    timerange: Number of time units in the entire dataset.
+    arparams: parameters for the autocorrelations, shape (n_series, p).
+    maparams: parameters for the moving averages, shape (n_series, q).
+    scale: standard deviation of the white noise error term, shape (n_series,).
+    noise: standard normal draws for the white noise error term, shape (n_series, timerange).
+    """
+
+    # scipy is only imported when the arma process is simulated
+    from scipy.signal import lfilter
+
+    n_ar = arparams.shape[1]
+    parameters, groups = np.unique(np.hstack([arparams, maparams]), axis=0, return_inverse=True)
+    groups = groups.ravel()
+
+    z_arma = np.empty((noise.shape[0], timerange))
+    for group, group_parameters in enumerate(parameters):
+        ar = np.r_[1, -group_parameters[:n_ar]]  # add zero-lag and negate
+        ma = np.r_[1, group_parameters[n_ar:]]  # add zero-lag
+        members = groups == group
+        eta = scale[members, None] * noise[members, :timerange]
+        z_arma[members] = lfilter(ma, ar, eta, axis=1)
+
+    # Round values arma process to 4 digits
+    return z_arma.round(4)
+
+
+def _series_generators(seed: Any, series_ids: np.ndarray) -> List[tuple]:
+    """
+    This function creates the random generators of every series in a batch, see
+    _timeseries_generators. The streams only depend on the seed and the series id, so the same
+    series is simulated identically regardless of the batch, partition or worker it ends up in.
+
+    Parameters:
+
+    seed: fixed seed for the random sampling elements.
+    series_ids: identifiers of the series in the batch.
+    """
+
+    # Resolve the entropy once, so an unseeded batch still derives all series from one root
+    entropy = np.random.SeedSequence(seed).entropy
+    return [_timeseries_generators(entropy, series_id) for series_id in series_ids]
+
+
+def simulate_timeseries_block(
+    n_series: int,
+    timerange: int,
+    fullyear: int,
+    frequencies: Any,
+    amplitudes: Any,
+    arparams: Any,
+    maparams: Any,
+    scale: Any,
+    promotion: bool = False,
+    promotion_uplift: Any = None,
+    promotion_frequency: Any = None,
+    seed: Any = None,
+    series_ids: Any = None,
+) -> tuple:
+    """
+    This function simulates a batch of sales timeseries at once. Every parameter can either
+    be shared by all series or be supplied per series. The result is a tuple of 2-D arrays
+    (sales_total, sales_arma, promotion_timing) with one row per series.
+
+    Parameters:
+
+    n_series: number of series to simulate.
+    timerange: total timespan for which the timeseries needs to be created
+    fullyear: Number of time units in a single year.
+    frequencies: Frequencies for the fourier terms, shape (n_terms,) or (n_series, n_terms).
+    amplitudes: Amplitudes for the fourier terms, shape (n_terms,) or (n_series, n_terms).
+    arparams: parameters for the autocorrelations, shape (p,) or (n_series, p).
+    maparams: parameters for the moving averages, shape (q,) or (n_series, q).
+    scale: standard deviation of the white noise error term, scalar or shape (n_series,).
+    promotion: boolean that indicates whether promotion effects need to be modeled as well.
+    promotion_uplift: size of the promotional uplift, scalar or shape (n_series,).
+    promotion_frequency: frequency at which the promotions occur, scalar or shape (n_series,).
+    seed: fixed seed for the random sampling elements.
+    series_ids: identifiers of the series, used to derive a deterministic random stream per
+    series. Defaults to 0 .. n_series - 1.
+    """
+
+    if series_ids is None:
+        series_ids = np.arange(n_series)
 
     # Take two full years as a period for thinning the sampled data.
     thinning = fullyear * 2
     simulationrange = timerange + thinning
 
-    # Simulated the arma effects
-    sales_arma = simulate_arma(
-        timerange=simulationrange, arparams=arparams, maparams=maparams, scale=scale, seed=seed
+    # Draw the random elements per series: the white noise and the promotion draws
+    noise = np.empty((n_series, simulationrange))
+    draws = np.empty((n_series, simulationrange if promotion is True else 0))
+    for i, (arma_rng, promotion_rng) in enumerate(_series_generators(seed, series_ids)):
+        noise[i] = arma_rng.standard_normal(simulationrange)
+        if promotion is True:
+            draws[i] = promotion_rng.uniform(0, 1, simulationrange)
+
+    # Simulate the arma effects
+    sales_arma = simulate_arma_batch(
+        timerange=simulationrange,
+        arparams=_broadcast_vector_parameter(arparams, n_series),
+        maparams=_broadcast_vector_parameter(maparams, n_series),
+        scale=_broadcast_scalar_parameter(scale, n_series),
+        noise=noise,
     )
 
-    # Simulated the seasonal flow
-    seasonality = simulate_seasonal_flow(timerange=fullyear, frequencies=frequencies, amplitudes=amplitudes)
-    y = seasonality
+    # Simulate the seasonal flow
+    seasonality = simulate_seasonal_flow_batch(
+        fullyear=fullyear,
+        frequencies=_broadcast_vector_parameter(frequencies, n_series),
+        amplitudes=_broadcast_vector_parameter(amplitudes, n_series),
+    )
 
-    # Create the sales timeseries
-    for i in range(fullyear, simulationrange):
-        y.append(y[i - fullyear] + sales_arma[i])
+    # Create the sales timeseries: y_t = y_(t - fullyear) + arma_t, computed as a cumulative
+    # sum over the years for every position within the year.
+    n_years = -(-simulationrange // fullyear)
+    increments = np.zeros((n_series, n_years * fullyear))
+    increments[:, :fullyear] = seasonality
+    increments[:, fullyear:simulationrange] = sales_arma[:, fullyear:]
+    sales_total = increments.reshape(n_series, n_years, fullyear).cumsum(axis=1)
+    sales_total = sales_total.reshape(n_series, -1)[:, :simulationrange]
 
     # Add the promotional effect
+    promotion_timing = np.zeros((n_series, simulationrange), dtype=bool)
     if promotion is True:
-        (sales_total, promotion_timing) = simulate_promotion(
-            timerange=simulationrange,
+        probability = _broadcast_scalar_parameter(promotion_frequency, n_series) / fullyear
+        promotion_timing = draws <= probability[:, None]
+        uplift = _broadcast_scalar_parameter(promotion_uplift, n_series)
+        sales_total *= promotion_timing * uplift[:, None] + 1
+
+    # Use the thinning for the dataset, converted into contiguous float32 arrays
+    return (
+        sales_total[:, thinning:].astype(np.float32),
+        sales_arma[:, thinning:].astype(np.float32),
+        promotion_timing[:, thinning:].astype(np.float32),
+    )
+
+
+def simulate_timeseries_batch(
+    n_series: int,
+    timerange: int,
+    fullyear: int,
+    frequencies: Any,
+    amplitudes: Any,
+    arparams: Any,
+    maparams: Any,
+    scale: Any,
+    promotion: bool = False,
+    promotion_uplift: Any = None,
+    promotion_frequency: Any = None,
+    seed: Any = None,
+    series_ids: Any = None,
+    output: str = "pandas",
+    block_size: Any = None,
+) -> Any:
+    """
+    This function simulates a batch of sales timeseries and returns them as a single
+    long-format dataframe with the columns series_id, time, sales_total, sales_arma
+    and promotion_timing. See simulate_timeseries_block for the parameters.
+    With output set to "arrow" the result is an Arrow table with the same columns.
+
+    The series are simulated in blocks of block_size series, which are written into preallocated
+    float32 columns, so the intermediate float64 values only exist for a single block. By default
+    a block holds as many series as fit in SIMULATION_CHUNKSIZE time units. The result does not
+    depend on the block size.
+    """
+
+    if series_ids is None:
+        series_ids = np.arange(n_series)
+    series_ids = np.asarray(series_ids, dtype=np.int64)
+    if block_size is None:
+        block_size = max(1, SIMULATION_CHUNKSIZE // (timerange + fullyear * 2))
+
+    columns = {
+        "series_id": np.repeat(series_ids, timerange),
+        "time": np.tile(np.arange(1, timerange + 1, dtype=np.int64), n_series),
+    }
+    # Broadcast the parameters once, so every block takes its rows from the same arrays
+    parameters = {
+        "frequencies": _broadcast_vector_parameter(frequencies, n_series),
+        "amplitudes": _broadcast_vector_parameter(amplitudes, n_series),
+        "arparams": _broadcast_vector_parameter(arparams, n_series),
+        "maparams": _broadcast_vector_parameter(maparams, n_series),
+        "scale": _broadcast_scalar_parameter(scale, n_series),
+    }
+    if promotion:
+        parameters["promotion_uplift"] = _broadcast_scalar_parameter(promotion_uplift, n_series)
+        parameters["promotion_frequency"] = _broadcast_scalar_parameter(promotion_frequency, n_series)
+
+    values = {column: np.empty(n_series * timerange, dtype=np.float32) for column in TIMESERIES_COLUMNS}
+    for start in range(0, n_series, block_size):
+        end = min(start + block_size, n_series)
+        block = simulate_timeseries_block(
+            n_series=end - start,
+            timerange=timerange,
             fullyear=fullyear,
-            sales_total=y,
-            promotion_uplift_perc=promotion_uplift,
-            promotion_frequency=promotion_frequency,
+            promotion=promotion,
+            seed=seed,
+            series_ids=series_ids[start:end],
+            **{name: value[start:end] for name, value in parameters.items()},
         )
+        rows = slice(start * timerange, end * timerange)
+        for column, array in zip(TIMESERIES_COLUMNS, block):
+            values[column][rows] = array.ravel()
+    columns.update(values)
 
-    # Add placeholders for the promotional effects
-    if promotion is False:
-        sales_total = y
-        promotion_timing = [0 for day in range(0, simulationrange)]
-
-    # Use the thinning for the dataset
-    sales_total = sales_total[thinning:simulationrange]
-    promotion_timing = promotion_timing[thinning:simulationrange]
-    sales_arma = sales_arma[thinning:simulationrange]
-    time = [day for day in range(1, timerange + 1)]
-
-    print(len(sales_total), len(sales_arma), len(time))
-
-    # Combine data in dataframe
-    timeseries_dataset = pd.DataFrame(
-        {
-            "time": time,
-            "sales_total": sales_total,
-            "sales_arma": sales_arma,
-            "promotion_timing": promotion_timing,
-        }
-    )
+    if output == "arrow":
+        import pyarrow as pa
 
-    # Downcast the timeseries to float32
-    timeseries_dataset["sales_total"] = pd.to_numeric(timeseries_dataset["sales_total"], downcast="float")
-    timeseries_dataset["sales_arma"] = pd.to_numeric(timeseries_dataset["sales_arma"], downcast="float")
-    timeseries_dataset["promotion_timing"] = pd.to_numeric(
-        timeseries_dataset["promotion_timing"], downcast="float"
-    )
+        return pa.table({column: pa.array(values) for column, values in columns.items()})
 
-    timeseries_dataset = timeseries_dataset.set_index("time")
+    timeseries_dataset = pd.DataFrame(columns)
 
     return timeseries_dataset
@@ -11,6 +11,8 @@ setup(
         "console_scripts": [
             "etl = examplerepo.tasks.sample_etl_task:entrypoint",
             "model = examplerepo.tasks.sample_ml_task:entrypoint",
+            "trends = examplerepo.tasks.sample_trends_task:entrypoint",
+            "pipeline = examplerepo.tasks.pipeline_task:entrypoint",
         ]
     },
 )
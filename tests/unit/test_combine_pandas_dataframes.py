@@ -0,0 +1,47 @@
+"""
+Unit tests for combining pandas dataframes
+"""
+
+import pandas as pd
+import pyarrow as pa
+
+from examplerepo.helperfunctions.combine_pandas_dataframes import DataFrameAccumulator
+
+
+class TestCombinePandasDataframes:
+    def test_accumulator(self, spark):
+        batches = [pd.DataFrame({"keyword": [str(i)] * 10, "interest": range(10)}) for i in range(5)]
+
+        accumulator = DataFrameAccumulator()
+        for batch in batches:
+            accumulator.append(batch)
+        accumulator.append(None)
+
+        assert accumulator.finalize().equals(pd.concat(batches))
+        assert accumulator.finalize() is None
+
+    def test_accumulator_spilling(self, spark, tmp_path):
+        batches = [pd.DataFrame({"keyword": [str(i)] * 10, "interest": range(10)}) for i in range(5)]
+
+        accumulator = DataFrameAccumulator(memory_budget=1000, spill_directory=tmp_path)
+        other_accumulator = DataFrameAccumulator(memory_budget=1000, spill_directory=tmp_path)
+        for batch in batches:
+            accumulator.append(batch)
+            other_accumulator.append(batch.assign(interest=-batch["interest"]))
+
+        assert len(accumulator.spilled_files) > 0
+        assert accumulator.finalize().equals(pd.concat(batches))
+
+        # the spilled batches of an accumulator are removed, those of other accumulators are kept
+        assert len(list(tmp_path.iterdir())) == 1
+        other_accumulator.close()
+        assert list(tmp_path.iterdir()) == []
+
+    def test_accumulator_arrow(self, spark):
+        batches = [pa.table({"keyword": [str(i)] * 10, "interest": range(10)}) for i in range(5)]
+
+        accumulator = DataFrameAccumulator()
+        for batch in batches:
+            accumulator.append(batch)
+
+        assert len(accumulator.finalize().index) == 50
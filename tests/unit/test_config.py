@@ -0,0 +1,137 @@
+"""
+Unit tests for loading and validating task configurations
+"""
+
+import os
+from types import SimpleNamespace
+from pathlib import Path
+
+import pytest
+
+from examplerepo.config import ConfigError, read_config, apply_env_overrides
+from examplerepo.tasks.pipeline_task import PipelineTask
+from examplerepo.tasks.sample_ml_task import SampleModelTask
+from examplerepo.tasks.sample_etl_task import SampleSimulatedDataTask
+from examplerepo.tasks.sample_trends_task import SampleGoogleTrendsTask
+
+CONF_DIRECTORY = Path(__file__).parents[2] / "conf" / "test"
+
+
+class TestConfig:
+    def test_read_config(self, tmp_path):
+        conf_file = tmp_path / "config.yml"
+        conf_file.write_text("output:\n  table: timeseries\n")
+
+        conf = read_config(conf_file)
+        assert conf == {"output": {"table": "timeseries"}}
+        conf["output"]["table"] = "changed"
+        assert read_config(conf_file)["output"]["table"] == "timeseries"
+
+        # a changed file is parsed again, also within the resolution of the modification time
+        conf_file.write_text("output:\n  table: sales\n")
+        os.utime(conf_file, ns=(0, conf_file.stat().st_mtime_ns + 1))
+        assert read_config(conf_file)["output"]["table"] == "sales"
+
+    def test_env_overrides(self):
+        conf = {"output": {"table": "timeseries"}}
+        environ = {
+            "EXAMPLEREPO__OUTPUT__TABLE": "sales",
+            "EXAMPLEREPO__SIMULATION__N_SERIES": "100",
+            "EXAMPLEREPO__OUTPUT__PARTITION_BY": "[series_id]",
+            "PATH": "/usr/bin",
+        }
+
+        overridden = apply_env_overrides(conf, environ)
+        assert overridden == {
+            "output": {"table": "sales", "partition_by": ["series_id"]},
+            "simulation": {"n_series": 100},
+        }
+        assert conf == {"output": {"table": "timeseries"}}
+        assert apply_env_overrides(conf, {}) is conf
+
+        with pytest.raises(ConfigError, match="not a section"):
+            apply_env_overrides(conf, {"EXAMPLEREPO__OUTPUT__TABLE__NAME": "sales"})
+
+        # only the sections of the schema are overridden
+        overridden = apply_env_overrides(conf, environ, schema=SampleModelTask.CONFIG_SCHEMA)
+        assert overridden == {"output": {"table": "timeseries"}}
+
+    def test_sample_configs(self):
+        for task_class, name in [
+            (SampleSimulatedDataTask, "etl"),
+            (SampleModelTask, "ml"),
+            (SampleGoogleTrendsTask, "trends"),
+            (PipelineTask, "pipeline"),
+        ]:
+            task_class.validate_conf(read_config(CONF_DIRECTORY / f"sample_{name}_config.yml"))
+
+    def test_validate_conf(self):
+        conf = {
+            "outptu": {"table": "timeseries"},
+            "simulation": {"mode": "streaming", "n_series": True, "scale": 1},
+        }
+
+        with pytest.raises(ConfigError) as error:
+            SampleSimulatedDataTask.validate_conf(conf)
+        assert str(error.value).splitlines()[1:] == [
+            "* outptu: unknown key",
+            "* output: required",
+            "* simulation.mode: expected one of ['local', 'distributed', 'chunked'], got 'streaming'",
+            "* simulation.n_series: expected int, got bool",
+        ]
+
+    def test_pipeline_env_overrides(self, spark, monkeypatch):
+        monkeypatch.setenv("EXAMPLEREPO__SIMULATION__N_SERIES", "100")
+        pipeline_config = read_config(CONF_DIRECTORY / "sample_pipeline_config.yml")
+        for task_conf in pipeline_config["tasks"].values():
+            task_conf["conf_file"] = str(CONF_DIRECTORY.parents[1] / task_conf["conf_file"])
+        pipeline = PipelineTask(spark, pipeline_config)
+
+        # the override of the ETL section does not make the other tasks invalid
+        dag = pipeline._get_dag()
+        tasks = {name: pipeline._create_task(name, task_conf, {}) for name, task_conf in dag.items()}
+        assert tasks["etl"].conf["simulation"]["n_series"] == 100
+        assert "simulation" not in tasks["model"].conf
+        assert "simulation" not in tasks["trends"].conf
+        assert "simulation" not in pipeline.conf
+
+    def test_fail_fast(self, spark):
+        etl_job = SampleSimulatedDataTask(init_conf={"output": {"database": "default"}})
+        with pytest.raises(ConfigError, match="output.table: required"):
+            etl_job.launch()
+        assert [span.name for span in etl_job.spans] == ["read_config"]
+        # neither the SparkSession nor the logger, which needs Spark, was created
+        assert "spark" not in etl_job.__dict__
+        assert "logger" not in etl_job.__dict__
+
+        pipeline_config = {
+            "tasks": {
+                "etl": {
+                    "task": "examplerepo.tasks.sample_etl_task.SampleSimulatedDataTask",
+                    "conf_file": str(CONF_DIRECTORY / "sample_etl_config.yml"),
+                },
+                "model": {
+                    "task": "examplerepo.tasks.sample_ml_task.SampleModelTask",
+                    "conf": {"input": {"table": "timeseries"}},
+                    "depends_on": ["etl"],
+                },
+            }
+        }
+        pipeline = PipelineTask(spark, pipeline_config)
+        with pytest.raises(ConfigError, match="Task model:(.|\n)*experiment: required"):
+            pipeline.launch()
+
+    def test_log_conf_without_spark(self):
+        etl_job = SampleSimulatedDataTask(
+            init_conf={"output": {"database": "default", "table": "timeseries"}}
+        )
+        assert etl_job.conf["output"]["table"] == "timeseries"
+        # the configuration is logged once the logger is created, reading it does not start Spark
+        assert "spark" not in etl_job.__dict__
+
+        messages = []
+        etl_job._prepare_logger = lambda: SimpleNamespace(info=messages.append)
+        etl_job.logger.info("Launching")
+        assert "Launching job with configuration parameters:" in messages
+        assert messages[-1] == "Launching"
+        assert etl_job._pending_messages == []
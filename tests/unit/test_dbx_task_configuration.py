@@ -1,12 +1,40 @@
+import sys
+import json
+import pstats
 import logging
 from pathlib import Path
+from unittest.mock import patch
 
 import mlflow
+import pandas as pd
+import pytest
+import pyarrow as pa
+from mlflow.tracking import MlflowClient
 
 from pyspark.sql import SparkSession
 
+from examplerepo.config import ConfigError, read_config
+from examplerepo.tasks.pipeline_task import PipelineTask
 from examplerepo.tasks.sample_ml_task import SampleModelTask
 from examplerepo.tasks.sample_etl_task import SampleSimulatedDataTask
+from examplerepo.tasks.sample_trends_task import SampleGoogleTrendsTask
+
+CONF_DIRECTORY = Path(__file__).parents[2] / "conf" / "test"
+
+
+class WindowTrendReq:
+    """
+    This class stands in for the TrendReq client and returns a weekly series for the requested window.
+    """
+
+    def build_payload(self, kw_list, cat=0, timeframe="today 5-y", geo="", gprop=""):
+        self.kw_list = kw_list
+        self.timeframe = timeframe
+
+    def interest_over_time(self):
+        startdate, enddate = self.timeframe.split(" ")
+        dates = pd.date_range(startdate, enddate, freq="W", name="date")
+        return pd.DataFrame({self.kw_list[0]: 50, "isPartial": False}, index=dates)
 
 
 def test_jobs(spark: SparkSession, tmp_path: Path):
@@ -18,10 +46,16 @@ def test_jobs(spark: SparkSession, tmp_path: Path):
     table_name = f"{test_etl_config['output']['database']}.{test_etl_config['output']['table']}"
     _count = spark.table(table_name).count()
     assert _count > 0
+    assert spark.table(table_name).columns == ["time", "sales_total", "sales_arma", "promotion_timing"]
     logging.info("Testing the ETL task - done")
 
     logging.info("Testing the ML task")
-    test_ml_config = {"input": common_config, "experiment": "/Shared/forecastingtest/sample_experiment"}
+    # the columns of the sample configuration, which include the time
+    columns = read_config(CONF_DIRECTORY / "sample_ml_config.yml")["input"]["columns"]
+    test_ml_config = {
+        "input": {**common_config, "columns": columns},
+        "experiment": "/Shared/forecastingtest/sample_experiment",
+    }
     ml_job = SampleModelTask(spark, test_ml_config)
     ml_job.launch()
     experiment = mlflow.get_experiment_by_name(test_ml_config["experiment"])
@@ -29,3 +63,412 @@ def test_jobs(spark: SparkSession, tmp_path: Path):
     runs = mlflow.search_runs(experiment_ids=[experiment.experiment_id])
     assert runs.empty is False
     logging.info("Testing the ML task - done")
+
+
+def test_distributed_simulation(spark: SparkSession):
+    logging.info("Testing the distributed ETL task")
+    test_etl_config = {
+        "output": {"database": "default", "table": "timeseries_distributed"},
+        "simulation": {"mode": "distributed", "n_series": 6, "series_per_partition": 2, "timerange": 104},
+    }
+    etl_job = SampleSimulatedDataTask(spark, test_etl_config)
+    etl_job.launch()
+    _data = spark.table("default.timeseries_distributed").toPandas().sort_values(["series_id", "time"])
+    assert len(_data.index) == 6 * 104
+
+    # the series do not depend on the partitioning of the parameters
+    test_etl_config["simulation"]["series_per_partition"] = 6
+    _local = SampleSimulatedDataTask(spark, test_etl_config).simulate_distributed().toPandas()
+    _local = _local.sort_values(["series_id", "time"])
+    assert (_data["sales_total"].to_numpy() == _local["sales_total"].to_numpy()).all()
+    logging.info("Testing the distributed ETL task - done")
+
+
+def test_chunked_simulation(spark: SparkSession):
+    logging.info("Testing the chunked ETL task")
+    test_etl_config = {
+        "output": {"database": "default", "table": "timeseries_chunked"},
+        "simulation": {"mode": "chunked", "chunksize": 50},
+    }
+    etl_job = SampleSimulatedDataTask(spark, test_etl_config)
+    etl_job.launch()
+    _data = spark.table("default.timeseries_chunked").toPandas().sort_values("time", ignore_index=True)
+    assert len(_data.index) == 208
+    assert len([span for span in etl_job.spans if span.name == "write_delta"]) == 5
+
+    # the chunks hold the same series as the simulation in a single dataframe
+    pd.testing.assert_frame_equal(_data, etl_job.simulate_date().reset_index())
+    logging.info("Testing the chunked ETL task - done")
+
+
+def test_arrow_transfer(spark: SparkSession):
+    logging.info("Testing the Arrow based transfer between pandas and Spark")
+    etl_job = SampleSimulatedDataTask(spark, {"output": {"table": "timeseries"}})
+    _data = etl_job.simulate_date()
+    df = etl_job._to_spark(_data)
+    assert [field.dataType.simpleString() for field in df.schema.fields] == ["float", "float", "float"]
+
+    _collected = etl_job._to_pandas(df)
+    assert [str(item) for item in _collected.dtypes] == ["float32", "float32", "float32"]
+    assert etl_job.bytes_transferred > 0
+    logging.info("Testing the Arrow based transfer between pandas and Spark - done")
+
+
+def test_incremental_trends(spark: SparkSession, monkeypatch: pytest.MonkeyPatch):
+    logging.info("Testing the incremental Google Trends task")
+    test_trends_config = {
+        "output": {"database": "default", "table": "googletrends"},
+        "keywords": ["aardbeien", "peer"],
+        "duration": 12,
+        "requests_per_second": 100,
+        "cache_mode": "bypass",
+    }
+    monkeypatch.setattr(SampleGoogleTrendsTask, "CLIENT_FACTORY", WindowTrendReq)
+    SampleGoogleTrendsTask(spark, test_trends_config).launch()
+    _count = spark.table("default.googletrends").count()
+
+    # the second run only merges the new window and does not duplicate stored dates
+    trends_job = SampleGoogleTrendsTask(spark, test_trends_config)
+    assert all(startdate is not None for startdate in trends_job._get_startdates(["aardbeien"]).values())
+    trends_job.launch()
+    _data = spark.table("default.googletrends").toPandas()
+    assert len(_data.index) == _count
+    assert not _data.duplicated(["keyword", "date"]).any()
+    logging.info("Testing the incremental Google Trends task - done")
+
+
+def test_model_search(spark: SparkSession):
+    logging.info("Testing the ML task with hyperparameter search")
+    SampleSimulatedDataTask(spark, {"output": {"database": "default", "table": "timeseries"}}).launch()
+    test_ml_config = {
+        "input": {"database": "default", "table": "timeseries"},
+        "experiment": "/Shared/forecastingtest/search_experiment",
+        "training": {"mode": "search"},
+        "search": {
+            "backend": "local",
+            "n_jobs": 2,
+            "max_trials": 3,
+            "seed": 12345,
+            "param_distributions": {"random_forest__n_estimators": [5, 10, 20]},
+        },
+    }
+    ml_job = SampleModelTask(spark, test_ml_config)
+    ml_job.launch()
+    experiment = mlflow.get_experiment_by_name(test_ml_config["experiment"])
+    runs = mlflow.search_runs(experiment_ids=[experiment.experiment_id])
+    trials = runs[runs["tags.mlflow.parentRunId"].notna()]
+    assert len(trials.index) == 3
+
+    # without any finished trial the model is trained with the default parameters
+    test_ml_config["search"]["timeout_seconds"] = -1
+    SampleModelTask(spark, test_ml_config).launch()
+    runs = mlflow.search_runs(experiment_ids=[experiment.experiment_id])
+    assert len(runs[runs["tags.mlflow.parentRunId"].notna()].index) == 3
+    assert (runs["metrics.search_trials"] == 0).any()
+    logging.info("Testing the ML task with hyperparameter search - done")
+
+
+def test_model_grouped(spark: SparkSession):
+    logging.info("Testing the ML task with a model per series")
+    test_etl_config = {
+        "output": {"database": "default", "table": "timeseries_grouped"},
+        "simulation": {"mode": "distributed", "n_series": 4, "series_per_partition": 2},
+    }
+    SampleSimulatedDataTask(spark, test_etl_config).launch()
+    test_ml_config = {
+        "input": {"database": "default", "table": "timeseries_grouped"},
+        "experiment": "/Shared/forecastingtest/grouped_experiment",
+        "training": {"mode": "grouped", "series_key": "series_id", "seed": 12345},
+    }
+    with pytest.raises(ConfigError, match="metrics_table: required in grouped mode"):
+        SampleModelTask(spark, test_ml_config).launch()
+
+    test_ml_config["training"]["metrics_table"] = "default.grouped_metrics"
+    ml_job = SampleModelTask(spark, test_ml_config)
+    mlflow.set_experiment(test_ml_config["experiment"])
+    ml_job._train_model()
+    metrics = spark.table("default.grouped_metrics").toPandas()
+    assert sorted(metrics["series_id"].to_list()) == [0, 1, 2, 3]
+    assert (metrics["n_rows"] == 208).all()
+    experiment = mlflow.get_experiment_by_name(test_ml_config["experiment"])
+    runs = mlflow.search_runs(experiment_ids=[experiment.experiment_id])
+    assert runs["metrics.n_series"].iloc[0] == 4
+    logging.info("Testing the ML task with a model per series - done")
+
+
+def test_lazy_bootstrap(spark: SparkSession):
+    etl_job = SampleSimulatedDataTask(init_conf={"output": {"table": "timeseries"}})
+    assert "spark" not in etl_job.__dict__
+    assert "logger" not in etl_job.__dict__
+
+    etl_job = SampleSimulatedDataTask(spark, {"output": {"table": "timeseries"}})
+    assert etl_job.spark is spark
+    assert etl_job.conf["output"]["table"] == "timeseries"
+
+
+def test_instrumentation(spark: SparkSession, tmp_path: Path):
+    logging.info("Testing the instrumentation spans")
+    trace_file = tmp_path / "trace.json"
+    test_etl_config = {
+        "output": {"database": "default", "table": "timeseries"},
+        "instrumentation": {"trace_file": str(trace_file)},
+    }
+    etl_job = SampleSimulatedDataTask(spark, test_etl_config)
+    etl_job.launch()
+    spans = {span.name: span for span in etl_job.spans}
+    assert {"read_config", "simulate", "to_spark", "write_delta", "launch"} <= set(spans)
+    assert spans["simulate"].rows == 208
+    assert spans["to_spark"].bytes > 0
+    assert spans["write_delta"].parent == "launch"
+    assert spans["launch"].duration >= spans["write_delta"].duration
+    # the peak RSS is that of the process, the increase is relative to the peak when the span started
+    assert spans["launch"].process_peak_rss_bytes >= spans["simulate"].process_peak_rss_bytes
+    assert 0 <= spans["simulate"].peak_rss_increase_bytes <= spans["launch"].peak_rss_increase_bytes
+
+    trace = json.loads(trace_file.read_text())
+    assert [event["name"] for event in trace["traceEvents"]] == [span.name for span in etl_job.spans]
+
+    logging.info("Testing the instrumentation spans as MLflow metrics")
+    test_ml_config = {
+        "input": {"database": "default", "table": "timeseries"},
+        "experiment": "/Shared/forecastingtest/instrumentation_experiment",
+    }
+    SampleModelTask(spark, test_ml_config).launch()
+    experiment = mlflow.get_experiment_by_name(test_ml_config["experiment"])
+    runs = mlflow.search_runs(experiment_ids=[experiment.experiment_id])
+    assert runs["metrics.span.fit.duration_seconds"].iloc[0] > 0
+    assert runs["metrics.span.fit.rows"].iloc[0] == 156
+    logging.info("Testing the instrumentation spans - done")
+
+
+def test_profile(spark: SparkSession, tmp_path: Path):
+    logging.info("Testing the profiled run of a task")
+    test_etl_config = {
+        "output": {"database": "default", "table": "timeseries"},
+        "profile": {"enabled": True, "output_dir": str(tmp_path / "etl")},
+    }
+    SampleSimulatedDataTask(spark, test_etl_config).run()
+    (profile_dir,) = (tmp_path / "etl").iterdir()
+    stats = pstats.Stats(str(profile_dir / "SampleSimulatedDataTask.pstats"))
+    assert stats.total_calls > 0
+    assert "Peak traced memory" in (profile_dir / "SampleSimulatedDataTask_allocations.txt").read_text()
+
+    logging.info("Testing the --profile job option and the MLflow artifacts of the ML task")
+    test_ml_config = {
+        "input": {"database": "default", "table": "timeseries"},
+        "experiment": "/Shared/forecastingtest/profile_experiment",
+    }
+    with patch.object(sys, "argv", ["model", "--profile", "--profile-dir", str(tmp_path / "ml")]):
+        SampleModelTask(spark, test_ml_config).run()
+    assert len(list((tmp_path / "ml").iterdir())) == 1
+    artifacts = MlflowClient().list_artifacts(mlflow.last_active_run().info.run_id, "profile")
+    assert "profile/SampleModelTask.pstats" in [artifact.path for artifact in artifacts]
+    logging.info("Testing the profiled run of a task - done")
+
+
+def test_write_layout(spark: SparkSession):
+    logging.info("Testing the layout options of the Delta output")
+    test_etl_config = {
+        "output": {
+            "database": "default",
+            "table": "timeseries_layout",
+            "partition_by": ["series_id"],
+            "repartition": 2,
+            "target_file_size": 1024 * 1024,
+            "zorder_by": ["time"],
+        },
+        "simulation": {"mode": "distributed", "n_series": 4, "series_per_partition": 2},
+    }
+    etl_job = SampleSimulatedDataTask(spark, test_etl_config)
+    etl_job.launch()
+    detail = spark.sql("DESCRIBE DETAIL default.timeseries_layout").collect()[0]
+    assert detail["partitionColumns"] == ["series_id"]
+    history = spark.sql("DESCRIBE HISTORY default.timeseries_layout").toPandas()
+    assert "OPTIMIZE" in history["operation"].to_list()
+    write_span = [span for span in etl_job.spans if span.name == "write_delta"][0]
+    assert write_span.rows == 4 * 208
+    assert write_span.bytes > 0
+    assert spark.conf.get("spark.databricks.delta.optimize.maxFileSize", None) is None
+
+    logging.info("Testing the overwrite of a subset of the Delta output")
+    test_etl_config["output"]["replace_where"] = "series_id = 1"
+    test_etl_config["simulation"]["parameters_table"] = "default.series_parameters"
+    parameters = spark.createDataFrame(pd.DataFrame({"series_id": [1], "scale": [2.0]}))
+    parameters.write.format("delta").mode("overwrite").saveAsTable("default.series_parameters")
+    SampleSimulatedDataTask(spark, test_etl_config).launch()
+    _data = spark.table("default.timeseries_layout").groupBy("series_id").count().toPandas()
+    assert sorted(_data["series_id"].to_list()) == [0, 1, 2, 3]
+    logging.info("Testing the layout options of the Delta output - done")
+
+
+def test_read_pushdown(spark: SparkSession):
+    logging.info("Testing the column selection, filters and sampling of the ML input")
+    test_etl_config = {
+        "output": {"database": "default", "table": "timeseries_pushdown"},
+        "simulation": {"mode": "distributed", "n_series": 4, "series_per_partition": 2},
+    }
+    SampleSimulatedDataTask(spark, test_etl_config).launch()
+    test_ml_config = {
+        "input": {
+            "database": "default",
+            "table": "timeseries_pushdown",
+            "columns": ["series_id", "sales_arma"],
+            "filters": ["time > 104"],
+        },
+        "experiment": "/Shared/forecastingtest/pushdown_experiment",
+    }
+    _data = SampleModelTask(spark, test_ml_config)._read_data()
+    assert list(_data.columns) == ["series_id", "sales_arma", "sales_total"]
+    assert len(_data.index) == 4 * 104
+
+    test_ml_config["input"]["sample"] = {"fraction": 0.25, "stratify_by": "series_id", "seed": 12345}
+    _data = SampleModelTask(spark, test_ml_config)._read_data()
+    assert (_data.groupby("series_id").size() == 26).all()
+    logging.info("Testing the column selection, filters and sampling of the ML input - done")
+
+
+def test_pipeline(spark: SparkSession):
+    logging.info("Testing the pipeline of tasks")
+    etl_task = "examplerepo.tasks.sample_etl_task.SampleSimulatedDataTask"
+    ml_task = "examplerepo.tasks.sample_ml_task.SampleModelTask"
+    simulation = {"mode": "distributed", "n_series": 2, "timerange": 104}
+    test_pipeline_config = {
+        "max_workers": 2,
+        "tasks": {
+            "etl_shared": {
+                "task": etl_task,
+                "conf": {
+                    "output": {"database": "default", "table": "pipeline_shared", "persist": False},
+                    "simulation": simulation,
+                },
+            },
+            "etl_arrow": {
+                "task": etl_task,
+                "conf": {
+                    "output": {"database": "default", "table": "pipeline_arrow"},
+                    "simulation": simulation,
+                },
+                "share": "arrow",
+            },
+            "model_shared": {
+                "task": ml_task,
+                "conf": {
+                    "input": {"database": "default", "table": "pipeline_shared"},
+                    "experiment": "/Shared/forecastingtest/pipeline_shared_experiment",
+                },
+                "depends_on": ["etl_shared"],
+            },
+            "model_arrow": {
+                "task": ml_task,
+                "conf": {
+                    "input": {"database": "default", "table": "pipeline_arrow"},
+                    "experiment": "/Shared/forecastingtest/pipeline_arrow_experiment",
+                },
+                "depends_on": ["etl_arrow"],
+            },
+        },
+    }
+    pipeline = PipelineTask(spark, test_pipeline_config)
+    pipeline.launch()
+    tasks = pipeline.tasks
+    assert not spark.catalog.tableExists("default.pipeline_shared")
+    assert spark.table("default.pipeline_arrow").count() == 2 * 104
+    assert isinstance(tasks["model_arrow"].inputs["default.pipeline_arrow"], pa.Table)
+    assert tasks["model_shared"].spans[0].name == "read_config"
+    for name in ["pipeline_shared", "pipeline_arrow"]:
+        experiment = mlflow.get_experiment_by_name(f"/Shared/forecastingtest/{name}_experiment")
+        assert mlflow.search_runs(experiment_ids=[experiment.experiment_id]).empty is False
+
+    logging.info("Testing the validation of the pipeline")
+    test_pipeline_config["tasks"]["etl_shared"]["depends_on"] = ["model_shared"]
+    with pytest.raises(ValueError, match="cycle"):
+        PipelineTask(spark, test_pipeline_config).launch()
+    logging.info("Testing the pipeline of tasks - done")
+
+
+def test_memoize(spark: SparkSession):
+    logging.info("Testing the memoization of the ETL task")
+    test_etl_config = {
+        "output": {"database": "default", "table": "timeseries_memoize"},
+        "simulation": {"timerange": 104},
+        "memoize": {"enabled": True},
+    }
+
+    def launched(config):
+        etl_job = SampleSimulatedDataTask(spark, config)
+        etl_job.launch()
+        return any(span.name == "launch" for span in etl_job.spans)
+
+    assert launched(test_etl_config)
+    assert not launched(test_etl_config)
+    # settings that do not change the data are not part of the fingerprint
+    assert not launched({**test_etl_config, "instrumentation": {"enabled": False}})
+    assert launched({**test_etl_config, "simulation": {"timerange": 104, "seed": 1}})
+    assert launched({**test_etl_config, "memoize": {"enabled": True, "force": True}})
+    assert spark.table("default.timeseries_memoize").count() == 104
+
+    logging.info("Testing the memoization after a failed launch")
+    test_etl_config["simulation"] = {"timerange": 104, "mode": "chunked", "chunksize": 50}
+    assert launched(test_etl_config)
+    write_table = SampleSimulatedDataTask._write_table
+    writes = []
+
+    def failing_write_table(self, *args, **kwargs):
+        writes.append(args)
+        if len(writes) == 2:
+            raise RuntimeError("Write of the second chunk failed")
+        return write_table(self, *args, **kwargs)
+
+    with patch.object(SampleSimulatedDataTask, "_write_table", failing_write_table):
+        with pytest.raises(RuntimeError, match="second chunk"):
+            launched({**test_etl_config, "memoize": {"enabled": True, "force": True}})
+    # the table only holds the first chunk, so it is not up to date
+    assert launched(test_etl_config)
+    assert spark.table("default.timeseries_memoize").count() == 104
+    logging.info("Testing the memoization of the ETL task - done")
+
+
+def test_model_incremental(spark: SparkSession, tmp_path: Path):
+    logging.info("Testing the incremental ML task")
+    test_etl_config = {
+        "output": {"database": "default", "table": "timeseries_incremental"},
+        "simulation": {"mode": "distributed", "n_series": 4, "series_per_partition": 1},
+    }
+    SampleSimulatedDataTask(spark, test_etl_config).launch()
+    for estimator in ["sgd", "lightgbm"]:
+        test_ml_config = {
+            "input": {"database": "default", "table": "timeseries_incremental"},
+            "experiment": f"/Shared/forecastingtest/incremental_{estimator}_experiment",
+            "training": {
+                "mode": "incremental",
+                "seed": 12345,
+                "incremental": {"estimator": estimator, "num_boost_round": 10, "spill_dir": str(tmp_path)},
+            },
+        }
+        ml_job = SampleModelTask(spark, test_ml_config)
+        ml_job.launch()
+        experiment = mlflow.get_experiment_by_name(test_ml_config["experiment"])
+        runs = mlflow.search_runs(experiment_ids=[experiment.experiment_id])
+        assert runs["metrics.r2"].iloc[0] > 0
+        assert "to_pandas" not in [span.name for span in ml_job.spans]
+    assert (tmp_path / "train.arrow").exists()
+    logging.info("Testing the incremental ML task - done")
+
+
+def test_model_lightgbm(spark: SparkSession):
+    logging.info("Testing the ML task with the LightGBM backend")
+    test_etl_config = {"output": {"database": "default", "table": "timeseries_lightgbm"}}
+    SampleSimulatedDataTask(spark, test_etl_config).launch()
+    test_ml_config = {
+        "input": {"database": "default", "table": "timeseries_lightgbm"},
+        "experiment": "/Shared/forecastingtest/lightgbm_experiment",
+        "training": {"estimator": "lightgbm", "n_jobs": 2, "params": {"n_estimators": 20}},
+    }
+    ml_job = SampleModelTask(spark, test_ml_config)
+    pipeline = ml_job._get_pipeline()
+    assert pipeline.named_steps["lightgbm"].get_params()["n_jobs"] == 2
+    ml_job.launch()
+    experiment = mlflow.get_experiment_by_name(test_ml_config["experiment"])
+    runs = mlflow.search_runs(experiment_ids=[experiment.experiment_id])
+    assert runs["metrics.r2"].notna().all()
+    logging.info("Testing the ML task with the LightGBM backend - done")
@@ -2,12 +2,64 @@
 Unit tests for download functionality for Google Trends
 """
 
-from examplerepo.testdata.create.googletrends import download_data_keyword_by_keyword
+from functools import partial
+
+import pandas as pd
+
+from examplerepo.helperfunctions.token_bucket import TokenBucket
+from examplerepo.testdata.create.googletrends import (
+    reshape_data,
+    renormalise_data,
+    download_reshape_data,
+    reshape_data_columnar,
+    download_data_concurrently,
+    download_data_keyword_by_keyword,
+)
+from examplerepo.helperfunctions.parquet_cache import ParquetCache
+
+
+class StubTrendReq:
+    """
+    This class stands in for the TrendReq client and returns a fixed weekly series per keyword.
+    The first request of every keyword fails to exercise the retry logic. The keywords that
+    already failed can be shared by the clients of the workers of a single download.
+    """
+
+    def __init__(self, failed=None):
+        self.failed = set() if failed is None else failed
+
+    def build_payload(self, kw_list, cat=0, timeframe="today 5-y", geo="", gprop=""):
+        self.kw_list = kw_list
+
+    def interest_over_time(self):
+        keyword = self.kw_list[0]
+        if keyword not in self.failed:
+            self.failed.add(keyword)
+            raise ConnectionError("Stub server unavailable")
+        dates = pd.date_range("2018-01-07", periods=10, freq="W", name="date")
+        return pd.DataFrame({keyword: range(10), "isPartial": False}, index=dates)
+
+
+class CountingTrendReq(StubTrendReq):
+    """
+    This class stands in for the TrendReq client and counts the number of requests.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.requests = 0
+
+    def interest_over_time(self):
+        self.requests += 1
+        self.failed.add(self.kw_list[0])
+        return super().interest_over_time()
 
 
 class TestDownloadGoogletrends:
-    def test_format_data(self, spark):
-        googletrends_data_final = download_data_keyword_by_keyword(["aardbeien", "peer", "appel", "banaan"])
+    def test_format_data(self, spark, tmp_path):
+        googletrends_data_final = download_data_keyword_by_keyword(
+            ["aardbeien", "peer", "appel", "banaan"], cache=ParquetCache(tmp_path)
+        )
 
         print(googletrends_data_final.columns)
 
@@ -19,3 +71,103 @@ class TestDownloadGoogletrends:
         ]
         assert [str(item) for item in googletrends_data_final.dtypes] == ["object", "bool", "object", "int64"]
         assert len(googletrends_data_final.index) > 0
+
+    def test_download_concurrently(self, spark):
+        keywords = ["aardbeien", "peer", "appel", "banaan"]
+        googletrends_data_final = download_data_concurrently(
+            keywords,
+            max_workers=2,
+            requests_per_second=100,
+            retry_backoff=0,
+            client_factory=partial(StubTrendReq, set()),
+            cache_mode="bypass",
+        )
+
+        assert [str(item) for item in googletrends_data_final.columns] == [
+            "date",
+            "isPartial",
+            "keyword",
+            "interest",
+        ]
+        assert [str(item) for item in googletrends_data_final.dtypes] == ["object", "bool", "object", "int64"]
+        assert sorted(googletrends_data_final["keyword"].unique()) == sorted(keywords)
+        assert len(googletrends_data_final.index) == 10 * len(keywords)
+
+    def test_token_bucket(self, spark):
+        bucket = TokenBucket(rate=1000, capacity=2)
+        for _ in range(10):
+            bucket.acquire()
+
+        assert bucket.tokens < 2
+
+    def test_cache(self, spark, tmp_path):
+        cache = ParquetCache(tmp_path)
+        datefilter = "2017-12-31 2021-12-31"
+        pytrends = CountingTrendReq()
+        arguments = dict(keywords=["aardbeien"], pytrends=pytrends, cache=cache)
+
+        first_run = download_reshape_data(datefilter, **arguments)
+        second_run = download_reshape_data(datefilter, **arguments)
+        assert pytrends.requests == 1
+        assert first_run.equals(second_run)
+
+        download_reshape_data(datefilter, cache_mode="refresh", **arguments)
+        download_reshape_data(datefilter, cache_mode="bypass", **arguments)
+        assert pytrends.requests == 3
+
+    def test_cache_eviction(self, spark, tmp_path):
+        cache = ParquetCache(tmp_path, max_bytes=0)
+        cache.put(cache.create_key(keywords=["peer"]), pd.DataFrame({"interest": range(10)}))
+
+        assert cache.get(cache.create_key(keywords=["peer"])) is None
+
+    def test_renormalise_data(self, spark):
+        reference_data = pd.DataFrame(
+            {"keyword": "peer", "date": ["2021-01-03", "2021-01-10"], "interest": 40}
+        )
+        googletrends_data = pd.DataFrame(
+            {
+                "keyword": "peer",
+                "date": ["2021-01-10", "2021-01-17"],
+                "interest": [80, 100],
+                "isPartial": False,
+            }
+        )
+
+        renormalised_data = renormalise_data(googletrends_data, reference_data)
+
+        assert renormalised_data["interest"].to_list() == [40, 50]
+        assert str(renormalised_data["interest"].dtype) == "int64"
+
+    def test_reshape_data(self, spark):
+        dates = pd.date_range("2021-01-03", periods=5, freq="W", name="date")
+        googletrendsresults_load = pd.DataFrame(
+            {"peer": range(5), "appel": range(5, 10), "isPartial": [False] * 4 + [True]}, index=dates
+        )
+
+        expected = pd.melt(
+            googletrendsresults_load.reset_index().assign(
+                date=lambda data: data["date"].astype(str).str[:10]
+            ),
+            id_vars=["date", "isPartial"],
+            value_vars=["peer", "appel"],
+            var_name="keyword",
+            value_name="interest",
+        )
+        googletrends_data_final = reshape_data(
+            googletrendsresults_load, longformat=True, keywords=["peer", "appel"]
+        )
+
+        pd.testing.assert_frame_equal(googletrends_data_final, expected)
+
+        googletrends_data_final = reshape_data_columnar(
+            googletrendsresults_load,
+            keywords=["peer", "appel"],
+            date_format="datetime",
+            categorical_keyword=True,
+        )
+
+        assert pd.api.types.is_datetime64_dtype(googletrends_data_final["date"])
+        assert str(googletrends_data_final["keyword"].dtype) == "category"
+        assert googletrends_data_final["keyword"].astype(str).equals(expected["keyword"])
+        assert googletrends_data_final["date"].dt.strftime("%Y-%m-%d").equals(expected["date"])
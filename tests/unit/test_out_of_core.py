@@ -0,0 +1,61 @@
+"""
+Unit tests for out-of-core training on streamed Arrow batches
+"""
+
+import numpy as np
+import pyarrow as pa
+import lightgbm as lgb
+from sklearn.metrics import r2_score
+
+from examplerepo.helperfunctions.out_of_core import RunningR2, ArrowSequence, spill_batches, batch_to_numpy
+
+
+def create_batches(n_batches=4, rows=500):
+    rng = np.random.default_rng(12345)
+    return [
+        pa.record_batch(
+            {
+                "x1": rng.normal(size=rows).astype(np.float32),
+                "x2": rng.normal(size=rows).astype(np.float32),
+                "y": rng.normal(loc=100, size=rows).astype(np.float32),
+            }
+        )
+        for _ in range(n_batches)
+    ]
+
+
+class TestOutOfCore:
+    def test_running_r2(self):
+        rng = np.random.default_rng(12345)
+        y_true = rng.normal(loc=1e6, size=1000)
+        y_pred = y_true + rng.normal(scale=0.5, size=1000)
+
+        r2 = RunningR2()
+        for start in range(0, 1000, 300):
+            stop = start + 300
+            r2.update(y_true[start:stop], y_pred[start:stop])
+
+        assert np.isclose(r2.score(), r2_score(y_true, y_pred))
+
+    def test_spill_batches(self, tmp_path):
+        batches = create_batches()
+        spilled = spill_batches(iter(batches + [batches[0].slice(0, 0)]), tmp_path / "spill" / "train.arrow")
+
+        assert len(spilled) == len(batches)
+        assert pa.Table.from_batches(spilled).equals(pa.Table.from_batches(batches))
+        assert batch_to_numpy(spilled[0], ["x1", "x2"]).dtype == np.float32
+        assert spill_batches(iter([]), tmp_path / "empty.arrow") == []
+
+    def test_arrow_sequence(self, tmp_path):
+        batches = spill_batches(iter(create_batches()), tmp_path / "train.arrow")
+        features = np.concatenate([batch_to_numpy(batch, ["x1", "x2"]) for batch in batches])
+        label = np.concatenate([batch.column("y").to_numpy() for batch in batches])
+
+        sequences = ArrowSequence.from_batches(batches, ["x1", "x2"], batch_size=128)
+        assert (sequences[1][10] == features[510]).all()
+        assert (sequences[1][10:20] == features[510:520]).all()
+
+        params = {"objective": "regression", "verbosity": -1, "seed": 12345, "deterministic": True}
+        streamed = lgb.train(params, lgb.Dataset(sequences, label=label, params=params), num_boost_round=10)
+        in_memory = lgb.train(params, lgb.Dataset(features, label=label, params=params), num_boost_round=10)
+        assert np.allclose(streamed.predict(features), in_memory.predict(features))
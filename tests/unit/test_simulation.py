@@ -2,9 +2,17 @@
 Unit tests for data simulation function
 """
 import numpy as np
+import pandas as pd
 import statsmodels.tsa.api as sm
+from statsmodels.tsa.arima_process import arma_generate_sample
 
-from examplerepo.testdata.create.simulation import simulate_promotion, simulate_timeseries
+from examplerepo.testdata.create.simulation import (
+    simulate_arma,
+    simulate_promotion,
+    simulate_timeseries,
+    simulate_timeseries_batch,
+    simulate_timeseries_chunks,
+)
 
 
 class TestDataSimulation:
@@ -79,4 +87,190 @@ class TestDataSimulation:
         ar_ma_params = [round(value, 7) for value in model.params[1:5]]
         print(ar_ma_params)
 
-        assert ar_ma_params == [0.7150908, -0.2293926, 0.6903164, 0.4493204]
+        assert ar_ma_params == [1.0363557, -0.3798058, 0.3441403, 0.2099061]
+
+    def test_batch_format_data(self, spark):
+
+        simulated_timeseries = simulate_timeseries_batch(
+            n_series=10,
+            timerange=208,
+            fullyear=52,
+            frequencies=[1, 2],
+            amplitudes=np.array([[4, 4]] * 5 + [[2, 6]] * 5),
+            arparams=np.array([0.75, -0.25]),
+            maparams=np.array([0.65, 0.35]),
+            scale=np.linspace(0.2, 1.0, 10),
+            promotion=True,
+            promotion_uplift=0.5,
+            promotion_frequency=5,
+            seed=12345,
+        )
+
+        assert [str(item) for item in simulated_timeseries.columns] == [
+            "series_id",
+            "time",
+            "sales_total",
+            "sales_arma",
+            "promotion_timing",
+        ]
+        assert [str(item) for item in simulated_timeseries.dtypes] == [
+            "int64",
+            "int64",
+            "float32",
+            "float32",
+            "float32",
+        ]
+        assert len(simulated_timeseries.index) == 10 * 208
+        assert simulated_timeseries["series_id"].nunique() == 10
+
+    def test_batch_seed(self, spark):
+        parameters = dict(
+            n_series=3,
+            timerange=104,
+            fullyear=52,
+            frequencies=[1, 2],
+            amplitudes=[4, 4],
+            arparams=np.array([0.75, -0.25]),
+            maparams=np.array([0.65, 0.35]),
+            scale=0.4,
+            seed=12345,
+        )
+
+        first_run = simulate_timeseries_batch(**parameters)
+        second_run = simulate_timeseries_batch(**parameters)
+
+        assert first_run.equals(second_run)
+
+    def test_batch_blocks(self, spark):
+        parameters = dict(
+            n_series=5,
+            timerange=104,
+            fullyear=52,
+            frequencies=[1, 2],
+            amplitudes=[4, 4],
+            arparams=np.array([0.75, -0.25]),
+            maparams=np.array([0.65, 0.35]),
+            scale=[0.2, 0.3, 0.4, 0.5, 0.6],
+            promotion=True,
+            promotion_uplift=0.5,
+            promotion_frequency=[1, 2, 3, 4, 5],
+            seed=12345,
+        )
+
+        simulated_batch = simulate_timeseries_batch(**parameters)
+        simulated_blocks = simulate_timeseries_batch(block_size=2, **parameters)
+
+        assert simulated_blocks.equals(simulated_batch)
+        assert (
+            simulated_blocks[["sales_total", "sales_arma", "promotion_timing"]].dtypes == np.float32
+        ).all()
+
+    def test_chunks(self, spark):
+        parameters = dict(
+            timerange=500,
+            fullyear=52,
+            frequencies=[1, 2],
+            amplitudes=[4, 4],
+            arparams=np.array([0.75, -0.25]),
+            maparams=np.array([0.65, 0.35]),
+            scale=0.4,
+            promotion=True,
+            promotion_uplift=0.5,
+            promotion_frequency=5,
+            seed=12345,
+        )
+
+        simulated_timeseries = simulate_timeseries(**parameters)
+
+        # chunks that do not align with the thinning period or with a full year
+        chunks = list(simulate_timeseries_chunks(chunksize=37, **parameters))
+
+        assert max(len(chunk.index) for chunk in chunks) <= 37
+        assert pd.concat(chunks).equals(simulated_timeseries)
+
+    def test_seed(self, spark):
+        parameters = dict(
+            timerange=208,
+            fullyear=52,
+            frequencies=[1, 2],
+            amplitudes=[4, 4],
+            arparams=np.array([0.75, -0.25]),
+            maparams=np.array([0.65, 0.35]),
+            scale=0.4,
+            promotion=True,
+            promotion_uplift=0.5,
+            promotion_frequency=5,
+            seed=12345,
+        )
+
+        first_run = simulate_timeseries(**parameters)
+
+        # the global random state does not influence the simulation
+        np.random.seed(0)
+        second_run = simulate_timeseries(**parameters)
+
+        assert first_run.equals(second_run)
+        assert first_run["promotion_timing"].sum() > 0
+
+    def test_seed_across_modes(self, spark):
+        parameters = dict(
+            timerange=208,
+            fullyear=52,
+            frequencies=[1, 2],
+            amplitudes=[4, 4],
+            arparams=np.array([0.75, -0.25]),
+            maparams=np.array([0.65, 0.35]),
+            scale=0.4,
+            promotion=True,
+            promotion_uplift=0.5,
+            promotion_frequency=5,
+            seed=12345,
+        )
+
+        # series 0 of a batch is the same series as the one simulated on its own
+        simulated_timeseries = simulate_timeseries(**parameters)
+        simulated_batch = simulate_timeseries_batch(n_series=3, **parameters)
+        first_series = simulated_batch[simulated_batch["series_id"] == 0].set_index("time")
+
+        for column in ["sales_total", "sales_arma", "promotion_timing"]:
+            np.testing.assert_allclose(
+                first_series[column].to_numpy(), simulated_timeseries[column].to_numpy(), rtol=1e-6
+            )
+
+    def test_arma_statsmodels(self, spark):
+        arparams = np.array([0.75, -0.25])
+        maparams = np.array([0.65, 0.35])
+        ar = np.r_[1, -arparams]
+        ma = np.r_[1, maparams]
+
+        z_arma = simulate_arma(timerange=1000, arparams=arparams, maparams=maparams, scale=0.4, seed=12345)
+        z_statsmodels = arma_generate_sample(
+            ar, ma, 1000, scale=0.4, distrvs=np.random.default_rng(12345).standard_normal
+        )
+
+        assert np.array_equal(z_arma, z_statsmodels.round(4))
+
+    def test_arrow_output(self, spark):
+        parameters = dict(
+            timerange=208,
+            fullyear=52,
+            frequencies=[1, 2],
+            amplitudes=[4, 4],
+            arparams=np.array([0.75, -0.25]),
+            maparams=np.array([0.65, 0.35]),
+            scale=0.4,
+            promotion=True,
+            promotion_uplift=0.5,
+            promotion_frequency=5,
+            seed=12345,
+        )
+
+        simulated_timeseries = simulate_timeseries(**parameters)
+        simulated_table = simulate_timeseries(output="arrow", **parameters)
+
+        assert simulated_table.column_names == ["time", "sales_total", "sales_arma", "promotion_timing"]
+        assert [str(item) for item in simulated_table.schema.types] == ["int64", "float", "float", "float"]
+        assert simulated_table.to_pandas().set_index("time").equals(simulated_timeseries)
+
+        simulated_batch = simulate_timeseries_batch(n_series=3, output="arrow", **parameters)
+        assert simulated_batch.to_pandas().equals(simulate_timeseries_batch(n_series=3, **parameters))